@@ -0,0 +1,776 @@
+"""Benchmark headless untuk streamlit_app.py.
+
+Menjalankan setiap halaman menu lewat streamlit.testing.v1.AppTest pada ukuran
+katalog, asupan, dan riwayat yang makin besar, lalu melaporkan persentil
+latensi rerun, memori per sesi, dan ukuran delta (ForwardMsg) per rerun.
+Cold start dan render pertama tiap halaman diukur di proses baru.
+Ditambah micro-benchmark method SugarTracker dengan dict biasa sebagai
+pengganti st.session_state, serta biaya instrumentasi (GLUPAL_METRICS) saat
+aktif dan nonaktif. Hasil ditulis sebagai JSON agar bisa dibandingkan antar
+rilis.
+
+Pemakaian:
+    python benchmarks/bench_app.py --output bench.json
+    python benchmarks/bench_app.py --catalog 100 5000 --intake 0 1000 --history 0 1825 --reruns 20
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from streamlit.testing.v1 import local_script_runner  # noqa: E402
+from streamlit.runtime.scriptrunner import script_runner  # noqa: E402
+
+import streamlit_app as app  # noqa: E402  (aman: UI hanya jalan saat __main__)
+
+PAGES = {
+    "Profil Pengguna": "👤 Profil Pengguna",
+    "Tambah Asupan": "➕ Tambah Asupan",
+    "Laporan Harian": "🏠 Laporan Harian",
+    "Riwayat & Grafik": "📊 Riwayat & Grafik",
+    "Database Makanan": "📚 Database Makanan",
+}
+
+
+def percentiles(samples):
+    """p50/p90/p99/maks dalam milidetik."""
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {'p50_ms': pick(0.5), 'p90_ms': pick(0.9), 'p99_ms': pick(0.99), 'max_ms': ordered[-1] * 1000, 'mean_ms': statistics.fmean(ordered) * 1000}
+
+
+def synthetic_catalog(size):
+    """Katalog asli yang diperbanyak dengan varian bernama unik sampai `size` item."""
+    with open(app.FOOD_DATABASE_FILE, encoding='utf-8') as f:
+        base = json.load(f)
+    keys = list(base)
+    catalog = {}
+    for i in range(size):
+        key = keys[i % len(keys)]
+        catalog[key if i < len(keys) else f"{key}_varian_{i}"] = base[key]
+    return catalog
+
+
+def synthetic_intake(size, seed=0, days=1):
+    """Log asupan acak; waktu tersebar di `days` hari terakhir (termasuk hari ini, sebelum jam sekarang)."""
+    rng = np.random.default_rng(seed)
+    keys = list(app.get_food_database())
+    table = app.get_unit_table()
+    foods = rng.integers(0, len(keys), size)
+    now = pd.Timestamp.now()
+    start = now.normalize() - pd.Timedelta(days=days - 1)
+    span = max(int((now - start).total_seconds()), 1)
+    return pd.DataFrame({
+        'makanan': [keys[i].replace('_', ' ') for i in foods],
+        'jumlah': rng.uniform(0.5, 3, size).round(1),
+        'satuan': [(units := table.units_for(keys[i]))[j % len(units)] for i, j in zip(foods, rng.integers(0, 12, size))],
+        'waktu': start + pd.to_timedelta(rng.integers(0, span, size), unit='s'),
+    })
+
+
+def synthetic_history(days, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = np.arange(np.datetime64(date.today()) - days + 1, np.datetime64(date.today()) + 1, dtype='datetime64[D]')
+    return app.HistorySeries(dates, rng.uniform(5, 90, days).round(2), np.full(days, 50.0), np.full(days, 36.0))
+
+
+@contextmanager
+def workspace(catalog_size):
+    """Salinan aplikasi di direktori sementara dengan katalog berukuran `catalog_size`."""
+    tmp = tempfile.mkdtemp(prefix='glupal-bench-')
+    try:
+        shutil.copy(os.path.join(ROOT, 'streamlit_app.py'), tmp)
+        for extra in ('static', '.streamlit'):
+            if os.path.isdir(os.path.join(ROOT, extra)):
+                shutil.copytree(os.path.join(ROOT, extra), os.path.join(tmp, extra))
+        with open(os.path.join(tmp, 'food_database.json'), 'w', encoding='utf-8') as f:
+            json.dump(synthetic_catalog(catalog_size), f)
+        yield os.path.join(tmp, 'streamlit_app.py')
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+class PayloadRecorder:
+    """Mencatat ukuran ForwardMsg dari rerun AppTest terakhir.
+
+    AppTest membangun pohon elemen dari LocalScriptRunner.forward_msgs();
+    method itu dibungkus agar total ByteSize() pesan bisa dibaca setelah run.
+    """
+
+    def __init__(self):
+        self.last_bytes = 0
+        self.last_messages = 0
+        self._original = local_script_runner.LocalScriptRunner.forward_msgs
+
+    def __enter__(self):
+        recorder, original = self, self._original
+
+        def forward_msgs(runner):
+            messages = original(runner)
+            recorder.last_bytes = sum(msg.ByteSize() for msg in messages)
+            recorder.last_messages = len(messages)
+            return messages
+
+        local_script_runner.LocalScriptRunner.forward_msgs = forward_msgs
+        return self
+
+    def __exit__(self, *exc):
+        local_script_runner.LocalScriptRunner.forward_msgs = self._original
+
+
+class ScriptTimer:
+    """Mencatat waktu eksekusi skrip rerun AppTest terakhir (tanpa polling AppTest)."""
+
+    def __init__(self):
+        self.last_s = 0.0
+        self._original = script_runner.exec_func_with_error_handling
+
+    def __enter__(self):
+        timer, original = self, self._original
+
+        def timed_exec(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                timer.last_s = time.perf_counter() - start
+
+        script_runner.exec_func_with_error_handling = timed_exec
+        return self
+
+    def __exit__(self, *exc):
+        script_runner.exec_func_with_error_handling = self._original
+
+
+def bench_page(app_path, page, intake_size, history_days, reruns, recorder, timer):
+    """Satu sesi AppTest: siapkan data, buka halaman, ukur `reruns` rerun.
+
+    Memori diukur dengan tracemalloc pada penyiapan sesi dan satu rerun;
+    latensi diukur terpisah tanpa tracemalloc karena tracing memperlambat rerun.
+    Waktu eksekusi skrip juga diukur dengan render cache hangat dan dengan cache
+    dikosongkan sebelum rerun; selisihnya adalah waktu yang dihemat cache.
+    """
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    at = AppTest.from_file(app_path, default_timeout=600).run()
+    tracker = at.session_state.tracker
+    tracker.set_user_profile("Bench", 30, "Pria", 70.0)
+    if intake_size:
+        tracker.add_food_items(synthetic_intake(intake_size))
+    if history_days:
+        at.session_state['history_data'] = {tracker.user_id: synthetic_history(history_days)}
+        tracker.version += 1
+    at.sidebar.radio[0].set_value(PAGES[page]).run()
+    if page == "Riwayat & Grafik" and history_days:
+        at.date_input[0].set_value(date.today() - timedelta(days=history_days - 1)).run()
+    if at.exception:
+        raise RuntimeError(f"{page}: {at.exception[0].message}")
+    first_render_bytes = recorder.last_bytes
+    session_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    at.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    cache = at.session_state.tracker.render_cache
+    samples, warm_script, cold_script = [], [], []
+    warm_hits = warm_misses = 0
+    # Rerun hangat dan dingin diselang-seling agar drift mesin mengenai keduanya sama rata.
+    for _ in range(reruns):
+        hits, misses = cache.hits, cache.misses
+        start = time.perf_counter()
+        at.run()
+        samples.append(time.perf_counter() - start)
+        warm_script.append(timer.last_s)
+        warm_hits, warm_misses = warm_hits + cache.hits - hits, warm_misses + cache.misses - misses
+        cache.clear()
+        at.run()
+        cold_script.append(timer.last_s)
+    warm, cold = percentiles(warm_script), percentiles(cold_script)
+    return {
+        'page': page,
+        'latency': percentiles(samples),
+        'script_warm_cache': warm,
+        'script_cold_cache': cold,
+        'cache_saved_p50_ms': cold['p50_ms'] - warm['p50_ms'],
+        'cache_hits': warm_hits,
+        'cache_misses': warm_misses,
+        'cache_hit_rate': warm_hits / (warm_hits + warm_misses) if warm_hits + warm_misses else None,
+        'session_cache_hit_rate': cache.hit_rate,
+        'session_bytes': session_bytes - before,
+        'rerun_peak_bytes': peak - before,
+        'first_render_delta_bytes': first_render_bytes,
+        'rerun_delta_bytes': recorder.last_bytes,
+        'rerun_delta_messages': recorder.last_messages,
+    }
+
+
+def run_page_benchmarks(catalog_sizes, intake_sizes, history_sizes, reruns):
+    results = []
+    with PayloadRecorder() as recorder, ScriptTimer() as timer:
+        for catalog_size in catalog_sizes:
+            with workspace(catalog_size) as app_path:
+                for intake_size in intake_sizes:
+                    for history_days in history_sizes:
+                        for page in PAGES:
+                            result = bench_page(app_path, page, intake_size, history_days, reruns, recorder, timer)
+                            result.update(catalog=catalog_size, intake=intake_size, history_days=history_days)
+                            results.append(result)
+                            print(f"[page] catalog={catalog_size} intake={intake_size} history={history_days} {page}: "
+                                  f"p50={result['latency']['p50_ms']:.1f}ms cache hemat={result['cache_saved_p50_ms']:.1f}ms delta={result['rerun_delta_bytes'] / 1024:.1f}KiB", file=sys.stderr)
+    return results
+
+
+def timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+STARTUP_SCRIPT = """
+import json, logging, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+from streamlit.runtime.scriptrunner import script_runner
+streamlit_import = time.perf_counter() - start
+logging.getLogger('streamlit').setLevel(logging.ERROR)
+script_times = []
+original = script_runner.exec_func_with_error_handling
+def timed_exec(*args, **kwargs):
+    start = time.perf_counter()
+    try:
+        return original(*args, **kwargs)
+    finally:
+        script_times.append(time.perf_counter() - start)
+script_runner.exec_func_with_error_handling = timed_exec
+at = AppTest.from_file(sys.argv[1], default_timeout=600).run()
+loaded = {name: name in sys.modules for name in ('numpy', 'pandas', 'plotly.graph_objects')}
+at.sidebar.radio[0].set_value(sys.argv[2]).run()
+for _ in range(int(sys.argv[3])):
+    at.run()
+print(json.dumps({'streamlit_import_s': streamlit_import, 'script_s': script_times, 'loaded_after_cold_run': loaded,
+                  'exception': at.exception[0].message if at.exception else None}))
+"""
+
+
+def run_startup_benchmarks(reruns, repeat=3):
+    """Cold start, render pertama tiap halaman, dan rerun stabil, masing-masing di proses baru.
+
+    Proses benchmark ini sendiri sudah memuat pandas/numpy, jadi cold start
+    hanya bisa diukur dari interpreter yang bersih. Waktu yang dicatat adalah
+    eksekusi skrip saja; waktu dinding AppTest didominasi polling internalnya.
+    """
+    results = []
+    with workspace(100) as app_path:
+        for page, label in PAGES.items():
+            runs = []
+            for _ in range(repeat):
+                out = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, app_path, label, str(reruns)],
+                                     capture_output=True, text=True, check=True, cwd=os.path.dirname(app_path), env=dict(os.environ, GLUPAL_HISTORY_BACKEND='session'))
+                runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+            if runs[0]['exception']:
+                raise RuntimeError(f"{page}: {runs[0]['exception']}")
+            median = lambda pick: statistics.median(pick(run) for run in runs) * 1000
+            results.append({
+                'page': page,
+                'streamlit_import_ms': median(lambda run: run['streamlit_import_s']),
+                'cold_run_ms': median(lambda run: run['script_s'][0]),
+                'first_render_ms': median(lambda run: run['script_s'][1]),
+                'rerun': percentiles([sample for run in runs for sample in run['script_s'][2:]]),
+                'loaded_after_cold_run': runs[0]['loaded_after_cold_run'],
+            })
+            print(f"[startup] {page}: cold={results[-1]['cold_run_ms']:.1f}ms first={results[-1]['first_render_ms']:.1f}ms "
+                  f"rerun p50={results[-1]['rerun']['p50_ms']:.2f}ms", file=sys.stderr)
+    return results
+
+
+SESSION_MEMORY_SCRIPT = """
+import gc, json, logging, os, sys
+logging.disable(logging.CRITICAL)
+import streamlit_app as app
+def rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+catalog = {key: dict(info) for key, info in app.get_food_database().items()}
+# Katalog lama adalah dict literal di _initialize_database: setiap tracker membangun dict
+# baru, tetapi string konstannya milik code object yang sama. lambda hasil compile meniru itu.
+build_literal = eval(compile('lambda: ' + repr(catalog), 'catalog_literal', 'eval'))
+storage = app.SessionHistoryStorage({})
+app.SugarTracker(storage=storage)  # pemanasan: katalog bersama & UnitTable dimuat sebelum pengukuran
+gc.collect()
+before = rss()
+trackers = []
+for _ in range(int(sys.argv[2])):
+    tracker = app.SugarTracker(storage=storage)
+    if sys.argv[1] == 'literal':
+        tracker.legacy_food_database = build_literal()
+    trackers.append(tracker)
+gc.collect()
+print(json.dumps({'rss_bytes': rss() - before}))
+"""
+
+
+def run_session_memory(counts):
+    """RSS per sesi: N SugarTracker dengan katalog bersama vs salinan dict literal per tracker.
+
+    Diukur di proses baru per (mode, N) dari /proc/self/statm (Linux).
+    """
+    results = []
+    for count in counts:
+        rss = {}
+        for mode in ('literal', 'shared'):
+            out = subprocess.run([sys.executable, '-c', SESSION_MEMORY_SCRIPT, mode, str(count)], capture_output=True, text=True,
+                                 check=True, cwd=ROOT, env=dict(os.environ, GLUPAL_HISTORY_BACKEND='session', PYTHONPATH=ROOT))
+            rss[mode] = json.loads(out.stdout.strip().splitlines()[-1])['rss_bytes']
+        results.append({
+            'sessions': count,
+            'literal_rss_bytes': rss['literal'],
+            'shared_rss_bytes': rss['shared'],
+            'literal_per_session_kib': rss['literal'] / count / 1024,
+            'shared_per_session_kib': rss['shared'] / count / 1024,
+            'saved_per_session_kib': (rss['literal'] - rss['shared']) / count / 1024,
+        })
+        print(f"[memory] {count} sesi: {results[-1]}", file=sys.stderr)
+    return results
+
+
+def run_micro_benchmarks(sizes):
+    """Method SugarTracker dengan SessionHistoryStorage di atas dict biasa."""
+    results = []
+    index = app.get_food_search_index()
+    for size in sizes:
+        tracker = app.SugarTracker(storage=app.SessionHistoryStorage({}))
+        tracker.set_user_profile("Bench", 30, "Pria", 70.0)
+        intake = synthetic_intake(size)
+        batch_s = timeit(lambda: app.SugarTracker(storage=app.SessionHistoryStorage({})).add_food_items(intake), 1)
+        tracker.add_food_items(intake)
+        state = {'history_data': {tracker.user_id: synthetic_history(size)}}
+        tracker.storage = app.SessionHistoryStorage(state)
+        first, last = tracker.history_bounds()
+        results.append({
+            'size': size,
+            'add_food_item_us': timeit(lambda: tracker.add_food_item("Teh Manis", 1, "gelas"), 1000) * 1e6,
+            'add_food_items_rows_per_s': size / batch_s if batch_s else None,
+            'calculate_daily_sugar_us': timeit(tracker.calculate_daily_sugar, 10000) * 1e6,
+            'daily_intake_records_ms': timeit(lambda: tracker.daily_intake, 5) * 1e3,
+            'get_history_1y_us': timeit(lambda: tracker.get_history(max(first, last - timedelta(days=364)), last), 1000) * 1e6,
+            'history_aggregate_ms': timeit(lambda: tracker.get_history().aggregate(app.choose_history_resolution(size)), 20) * 1e3,
+            'search_us': timeit(lambda: index.search("kopi susu"), 1000) * 1e6,
+            'archive_and_reset_day_us': timeit(tracker.archive_and_reset_day, 1) * 1e6,
+        })
+        print(f"[micro] size={size}: {results[-1]}", file=sys.stderr)
+    return results
+
+
+def run_sqlite_load(threads, days=60, read_days=30, pool_size=8):
+    """Uji beban SQLiteHistoryStorage: `threads` sesi serentak, tiap langkah satu arsip + satu baca rentang.
+
+    Semua thread mulai bersamaan (Barrier) pada satu file database di direktori
+    sementara. Error "database is locked" dan baris yang hilang dihitung,
+    bukan dilempar, agar hasilnya bisa dibandingkan antar konfigurasi.
+    """
+    tmp = tempfile.mkdtemp(prefix='glupal-sqlite-load-')
+    try:
+        storage = app.SQLiteHistoryStorage(os.path.join(tmp, 'history.db'), pool_size=pool_size)
+        first_day = date.today() - timedelta(days=days - 1)
+        barrier = threading.Barrier(threads)
+        write_s, read_s, errors = [], [], []
+        lock = threading.Lock()
+
+        def session(worker):
+            user_id = f"load-{worker}"
+            writes, reads, failures = [], [], []
+            barrier.wait()
+            for offset in range(days):
+                day = first_day + timedelta(days=offset)
+                record = {'total_gula': float(offset % 90), 'limit_kemenkes': 50, 'limit_aha': 36}
+                try:
+                    start = time.perf_counter()
+                    storage.save_day(user_id, day.isoformat(), record)
+                    writes.append(time.perf_counter() - start)
+                    start = time.perf_counter()
+                    storage.load_range(user_id, (day - timedelta(days=read_days - 1)).isoformat(), day.isoformat())
+                    reads.append(time.perf_counter() - start)
+                except sqlite3.Error as exc:
+                    failures.append(str(exc))
+            with lock:
+                write_s.extend(writes)
+                read_s.extend(reads)
+                errors.extend(failures)
+
+        workers = [threading.Thread(target=session, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        wall = time.perf_counter() - start
+        missing = sum(days - len(storage.load_range(f"load-{i}")) for i in range(threads))
+        result = {
+            'threads': threads, 'days': days, 'read_days': read_days, 'pool_size': pool_size,
+            'wall_s': wall,
+            'writes': len(write_s), 'reads': len(read_s),
+            'ops_per_s': (len(write_s) + len(read_s)) / wall,
+            'write_latency': percentiles(write_s) if write_s else None,
+            'read_latency': percentiles(read_s) if read_s else None,
+            'errors': len(errors),
+            'locked_errors': sum('locked' in error for error in errors),
+            'missing_rows': missing,
+        }
+        print(f"[sqlite-load] threads={threads}: {result['writes']} tulis + {result['reads']} baca dalam {wall:.2f}s, "
+              f"error={result['errors']}, baris hilang={missing}", file=sys.stderr)
+        return result
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def run_history_scale(users, years, seed=0):
+    """Riwayat harian `years` tahun untuk `users` pengguna: jalur lama (dict + strptime) vs HistorySeries/SQLite.
+
+    Setiap rerun "Riwayat & Grafik" memilih satu tahun terakhir dari riwayat
+    satu pengguna. Jalur lama mem-parse, mengurutkan, dan memfilter seluruh
+    kunci tanggal di Python; jalur baru memakai searchsorted (sesi) atau
+    kueri rentang berindeks (SQLite).
+    """
+    rng = np.random.default_rng(seed)
+    days = years * 365
+    series = {f"user-{u}": synthetic_history(days, seed=u) for u in range(users)}
+    last = date.today()
+    start = last - timedelta(days=364)
+
+    def as_dict(history):
+        return {str(day): {'total_gula': float(total), 'limit_kemenkes': 50, 'limit_aha': 36}
+                for day, total in zip(history.dates, history.total_gula)}
+    legacy = {user_id: as_dict(history) for user_id, history in series.items()}
+
+    def legacy_rerun(history):
+        all_dates = sorted([datetime.strptime(d, '%Y-%m-%d').date() for d in history.keys()])
+        filtered = [d.strftime('%Y-%m-%d') for d in all_dates if start <= d <= last]
+        return filtered, [history[d]['total_gula'] for d in filtered]
+
+    def series_rerun(history):
+        history.bounds()
+        window = history.slice(start, last)
+        return window.dates, window.total_gula
+
+    user_ids = list(series)
+    pick = lambda: user_ids[rng.integers(len(user_ids))]
+    tmp = tempfile.mkdtemp(prefix='glupal-history-scale-')
+    try:
+        storage = app.SQLiteHistoryStorage(os.path.join(tmp, 'history.db'))
+        begin = time.perf_counter()
+        for user_id, history in series.items():
+            for day, total in zip(history.dates, history.total_gula):
+                storage.save_day(user_id, str(day), {'total_gula': float(total), 'limit_kemenkes': 50, 'limit_aha': 36})
+        populate_s = time.perf_counter() - begin
+        one = series[user_ids[0]]
+        shuffled = rng.permutation(len(one))
+        def random_upserts():
+            fresh = app.HistorySeries()
+            for i in shuffled[:1000]:
+                fresh.upsert(one.dates[i], {'total_gula': float(one.total_gula[i]), 'limit_kemenkes': 50, 'limit_aha': 36})
+        result = {
+            'users': users, 'years': years, 'rows': users * days,
+            'legacy_rerun_1y_ms': timeit(lambda: legacy_rerun(legacy[pick()]), 20) * 1e3,
+            'series_rerun_1y_ms': timeit(lambda: series_rerun(series[pick()]), 2000) * 1e3,
+            'sqlite_populate_s': populate_s,
+            'sqlite_bounds_ms': timeit(lambda: storage.date_bounds(pick()), 500) * 1e3,
+            'sqlite_range_1y_ms': timeit(lambda: storage.load_range(pick(), str(start), str(last)), 200) * 1e3,
+            'sqlite_range_all_ms': timeit(lambda: storage.load_range(pick()), 50) * 1e3,
+            'aggregate_monthly_all_ms': timeit(lambda: series[pick()].aggregate('bulanan'), 200) * 1e3,
+            'random_upsert_us': timeit(random_upserts, 1) / 1000 * 1e6,
+        }
+        print(f"[history] {users} pengguna x {years} tahun: {result}", file=sys.stderr)
+        return result
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def run_intake_scaling(sizes):
+    """Total berjalan IntakeLog vs sum() lama atas list dict, saat log tumbuh sampai 100k entri (us)."""
+    results = []
+    for size in sizes:
+        tracker = app.SugarTracker(storage=app.SessionHistoryStorage({}))
+        tracker.set_user_profile("Bench", 30, "Pria", 70.0)
+        tracker.add_food_items(synthetic_intake(size))
+        legacy = tracker.daily_intake
+        today = date.today()
+        log = tracker.intake_log
+        ids = iter(range(1, size))
+        results.append({
+            'size': size,
+            'total_us': timeit(tracker.calculate_daily_sugar, 10000) * 1e6,
+            'total_for_day_us': timeit(lambda: tracker.calculate_daily_sugar(today), 10000) * 1e6,
+            'legacy_sum_us': timeit(lambda: sum(item['gula_gram'] for item in legacy), 20) * 1e6,
+            'append_us': timeit(lambda: log.append("Teh Manis", 1, "gelas", 20.0, "minuman"), 1000) * 1e6,
+            'remove_us': timeit(lambda: log.remove(next(ids)), min(size - 1, 1000)) * 1e6,
+            'update_us': timeit(lambda: log.update(0, 2, "gelas", 40.0), 1000) * 1e6,
+        })
+        print(f"[intake] size={size}: {results[-1]}", file=sys.stderr)
+    return results
+
+
+def run_batch_import(sizes, days=30):
+    """Impor massal add_food_items vs loop add_food_item per baris (baris/detik).
+
+    Varian multi_day menyebar waktu di `days` hari sehingga baris lampau masuk ke riwayat.
+    """
+    results = []
+    for size in sizes:
+        intake = synthetic_intake(size)
+        multi_day = synthetic_intake(size, days=days)
+        rows = list(intake[['makanan', 'jumlah', 'satuan']].itertuples(index=False, name=None))
+
+        def fresh():
+            tracker = app.SugarTracker(storage=app.SessionHistoryStorage({}))
+            tracker.set_user_profile("Bench", 30, "Pria", 70.0)
+            return tracker
+
+        fresh().add_food_items(intake.head(10))  # pemanasan: katalog DataFrame & jalur pandas
+        batch, loop = fresh(), fresh()
+        batch_s = timeit(lambda: batch.add_food_items(intake), 1)
+        loop_s = timeit(lambda: [loop.add_food_item(*row) for row in rows], 1)
+        spread = fresh()
+        multi_day_s = timeit(lambda: spread.add_food_items(multi_day), 1)
+        results.append({
+            'size': size,
+            'batch_rows_per_s': size / batch_s,
+            'per_item_rows_per_s': size / loop_s,
+            'speedup': loop_s / batch_s,
+            'multi_day_rows_per_s': size / multi_day_s,
+            'totals_match': abs(batch.calculate_daily_sugar() - loop.calculate_daily_sugar()) < 0.01 * size,
+        })
+        print(f"[batch] size={size}: {results[-1]}", file=sys.stderr)
+    return results
+
+
+def legacy_history_figure(history, aha, kemenkes):
+    """Grafik riwayat lama: semua titik harian plus dua trace penuh untuk garis batas."""
+    import plotly.graph_objects as go
+    dates = [str(day) for day in history.dates.astype(date)]
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=dates, y=history.total_gula.tolist(), mode='lines+markers', name='Konsumsi Gula', line=dict(color='var(--sugar-color)', width=4), hovertemplate='<b>%{x}</b><br>Gula: %{y:.1f} g<extra></extra>'))
+    fig.add_trace(go.Scatter(x=dates, y=[aha] * len(dates), mode='lines', name=f'Batas AHA ({aha}g)', line=dict(color='var(--aha-color)', dash='dash'), hoverinfo='skip'))
+    fig.add_trace(go.Scatter(x=dates, y=[kemenkes] * len(dates), mode='lines', name=f'Batas Kemenkes ({kemenkes}g)', line=dict(color='var(--kemenkes-color)', dash='longdash'), hoverinfo='skip'))
+    fig.update_layout(title_text="Grafik Konsumsi Gula", xaxis_title="Tanggal", yaxis_title="Jumlah Gula (g)", plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font=dict(color="var(--text-color)"), yaxis=dict(gridcolor='rgba(128,128,128,0.2)'), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1), hovermode="x unified")
+    return fig
+
+
+def run_figure_payload(ranges, repeat=5):
+    """Ukuran JSON dan waktu build+to_json grafik riwayat, lama (3 trace) vs teragregasi.
+
+    Render di browser tidak bisa diukur di sini; ukuran JSON adalah yang dikirim ke klien.
+    """
+    results = []
+    aha, kemenkes = 36, 50
+    for days in ranges:
+        history = synthetic_history(days)
+        resolution = app.choose_history_resolution(days)
+        legacy_json = legacy_history_figure(history, aha, kemenkes).to_json()
+        new_json = app.build_history_figure(history, aha, kemenkes, resolution).to_json()
+        results.append({
+            'days': days,
+            'resolution': resolution,
+            'legacy_bytes': len(legacy_json.encode()),
+            'aggregated_bytes': len(new_json.encode()),
+            'legacy_build_json_ms': timeit(lambda: legacy_history_figure(history, aha, kemenkes).to_json(), repeat) * 1e3,
+            'aggregated_build_json_ms': timeit(lambda: app.build_history_figure(history, aha, kemenkes, resolution).to_json(), repeat) * 1e3,
+        })
+        print(f"[figure] {days} hari: {results[-1]}", file=sys.stderr)
+    return results
+
+
+# Aturan konversi sebelum UnitTable: gram/ml = 1, satuan umum makanan, lalu berat generik ini.
+LEGACY_UNIT_FACTORS = {'sendok teh': 5, 'sendok makan': 15, 'cup': 240, 'scoop': 60, 'keping': 10, 'buah': 120, 'potong': 50, 'lembar': 25, 'porsi': 200, 'gelas': 250, 'cangkir': 150, 'kaleng': 330, 'kotak': 200, 'botol': 500, 'sachet': 20, 'mangkuk': 250, 'slice': 100}
+
+
+def legacy_grams_per_unit(food_info, satuan):
+    """Gram per satuan menurut add_food_item lama; None bila satuan ditolak."""
+    if satuan in ('gram', 'ml'): return 1.0
+    if satuan == food_info.get('satuan_umum'): return float(food_info.get('berat_satuan_umum', 0))
+    return float(LEGACY_UNIT_FACTORS[satuan]) if satuan in LEGACY_UNIT_FACTORS else None
+
+
+def run_unit_conversion(lookups=1_000_000, seed=0):
+    """Throughput konversi (aturan lama, grams_per_unit, lookup tervektorisasi) dan selisih hasil.
+
+    Setiap pasangan (makanan, satuan) dari katalog dibandingkan dengan aturan lama;
+    pasangan yang berubah dicantumkan satu per satu di 'changed'.
+    """
+    database, table = app.get_food_database(), app.get_unit_table()
+    units = sorted(set(table.units) | set(LEGACY_UNIT_FACTORS))
+    pairs = [(key, unit) for key in database for unit in units]
+    changed = []
+    for key, unit in pairs:
+        old, new = legacy_grams_per_unit(database[key], unit), table.grams_per_unit(key, unit)
+        new = None if np.isnan(new) else new
+        if old != new:
+            kind = 'dihapus' if new is None else 'ditambah' if old is None else 'berat_berubah'
+            changed.append({'food': key, 'unit': unit, 'old_g': old, 'new_g': new, 'kind': kind})
+    sample = [pairs[i] for i in np.random.default_rng(seed).integers(0, len(pairs), 10_000)]
+    legacy_s = timeit(lambda: [legacy_grams_per_unit(database[key], unit) for key, unit in sample], 5) / len(sample)
+    scalar_s = timeit(lambda: [table.grams_per_unit(key, unit) for key, unit in sample], 5) / len(sample)
+    rng = np.random.default_rng(seed)
+    rows, cols = rng.integers(0, len(table.food_keys), lookups), rng.integers(0, len(table.units), lookups)
+    vector_s = timeit(lambda: table.grams[rows, cols], 5) / lookups
+    kinds = [change['kind'] for change in changed]
+    result = {
+        'pairs': len(pairs),
+        'unchanged': len(pairs) - len(changed),
+        'changed_by_kind': {kind: kinds.count(kind) for kind in ('dihapus', 'ditambah', 'berat_berubah')},
+        'legacy_per_s': 1 / legacy_s,
+        'grams_per_unit_per_s': 1 / scalar_s,
+        'vectorized_per_s': 1 / vector_s,
+        'changed': changed,
+    }
+    print(f"[units] {result['unchanged']}/{result['pairs']} pasangan sama, berubah: {result['changed_by_kind']}; "
+          f"lama={result['legacy_per_s']:,.0f}/s grams_per_unit={result['grams_per_unit_per_s']:,.0f}/s "
+          f"vektor={result['vectorized_per_s']:,.0f}/s", file=sys.stderr)
+    return result
+
+
+SEARCH_QUERIES = {
+    'lebar': ['es', 'teh manis'],
+    'selektif': ['kopi susu', 'boba'],
+    'salah_ketik': ['bobba', 'kopi suss', 'mie gorng'],
+}
+
+
+def scan_search(keys, query):
+    """Pencarian lama: sort ulang dan scan substring linear di setiap rerun."""
+    query = query.lower()
+    return [key for key in sorted(keys) if query in key.replace('_', ' ').lower()]
+
+
+def adaptive_timeit(fn, budget_s=0.2):
+    """Rata-rata detik per panggilan; jumlah ulangan disesuaikan agar total sekitar `budget_s`."""
+    once = timeit(fn, 1)
+    return timeit(fn, max(1, min(1000, int(budget_s / max(once, 1e-6)))))
+
+
+def run_search_benchmarks(sizes):
+    """FoodSearchIndex vs scan linear lama pada katalog sintetis berbagai ukuran (ms per kueri)."""
+    results = []
+    for size in sizes:
+        keys = list(synthetic_catalog(size))
+        start = time.perf_counter()
+        index = app.FoodSearchIndex(keys)
+        build_s = time.perf_counter() - start
+        for kind, queries in SEARCH_QUERIES.items():
+            for query in queries:
+                results.append({
+                    'size': size, 'kind': kind, 'query': query,
+                    'hits': len(index.search(query)),
+                    'scan_ms': adaptive_timeit(lambda: scan_search(keys, query)) * 1e3,
+                    'index_ms': adaptive_timeit(lambda: index.search(query)) * 1e3,
+                    'index_top50_ms': adaptive_timeit(lambda: index.search(query, limit=50)) * 1e3,
+                    'index_build_s': build_s,
+                })
+                print(f"[search] n={size} {query!r}: scan={results[-1]['scan_ms']:.3f}ms index={results[-1]['index_ms']:.3f}ms "
+                      f"top50={results[-1]['index_top50_ms']:.3f}ms hits={results[-1]['hits']}", file=sys.stderr)
+    return results
+
+
+def run_instrumentation_overhead(repeat=200_000):
+    """Biaya per panggilan span()/incr() saat instrumentasi nonaktif vs aktif (ns)."""
+    def cost(metrics):
+        def with_span():
+            with metrics.span('bench'):
+                pass
+        return {
+            'span_ns': timeit(with_span, repeat) * 1e9,
+            'incr_ns': timeit(lambda: metrics.incr('bench'), repeat) * 1e9,
+        }
+    tracker = app.SugarTracker(storage=app.SessionHistoryStorage({}))
+    result = {
+        'baseline_call_ns': timeit(lambda: None, repeat) * 1e9,
+        'disabled': cost(app.Metrics(enabled=False)),
+        'enabled': cost(app.Metrics(enabled=True)),
+        'metrics_env_enabled': app.METRICS_ENABLED,
+        'calculate_daily_sugar_ns': timeit(tracker.calculate_daily_sugar, repeat) * 1e9,
+        'calculate_daily_sugar_undecorated_ns': timeit(lambda: tracker.intake_log.total_gula, repeat) * 1e9,
+    }
+    print(f"[instrumentation] {result}", file=sys.stderr)
+    return result
+
+
+def metadata():
+    try:
+        revision = subprocess.run(['git', '-C', ROOT, 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        revision = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': revision or None,
+        'python': platform.python_version(),
+        'streamlit': streamlit.__version__,
+        'platform': platform.platform(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--catalog', type=int, nargs='+', default=[100, 5000], help='ukuran katalog')
+    parser.add_argument('--intake', type=int, nargs='+', default=[0, 1000], help='jumlah entri asupan')
+    parser.add_argument('--history', type=int, nargs='+', default=[0, 365], help='jumlah hari riwayat')
+    parser.add_argument('--reruns', type=int, default=10, help='rerun terukur per halaman')
+    parser.add_argument('--micro', type=int, nargs='+', default=[1000, 10000], help='ukuran data micro-benchmark')
+    parser.add_argument('--search', type=int, nargs='+', default=[100, 10_000, 100_000], help='ukuran katalog benchmark pencarian')
+    parser.add_argument('--sqlite-load', type=int, nargs='*', default=[300], help='jumlah thread uji beban SQLite (kosong = lewati)')
+    parser.add_argument('--history-users', type=int, default=50, help='jumlah pengguna benchmark skala riwayat (0 = lewati)')
+    parser.add_argument('--history-years', type=int, default=10, help='tahun riwayat harian per pengguna')
+    parser.add_argument('--intake-scaling', type=int, nargs='*', default=[1000, 10_000, 100_000], help='ukuran log asupan untuk uji total O(1)')
+    parser.add_argument('--batch-import', type=int, nargs='*', default=[1000, 50_000], help='jumlah baris impor massal vs per item')
+    parser.add_argument('--sessions', type=int, nargs='*', default=[1000, 10_000], help='jumlah sesi simulasi untuk RSS per sesi')
+    parser.add_argument('--figure-days', type=int, nargs='*', default=[30, 365, 1825], help='rentang riwayat (hari) untuk ukuran JSON grafik')
+    parser.add_argument('--skip-pages', action='store_true', help='hanya jalankan micro-benchmark')
+    parser.add_argument('--output', help='file JSON hasil (default: stdout)')
+    args = parser.parse_args(argv)
+
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    os.environ['GLUPAL_HISTORY_BACKEND'] = 'session'
+    report = {
+        'meta': metadata(),
+        'session_memory': run_session_memory(args.sessions),
+        'micro': run_micro_benchmarks(args.micro),
+        'history_scale': run_history_scale(args.history_users, args.history_years) if args.history_users else None,
+        'intake_scaling': run_intake_scaling(args.intake_scaling),
+        'batch_import': run_batch_import(args.batch_import),
+        'unit_conversion': run_unit_conversion(),
+        'figure_payload': run_figure_payload(args.figure_days),
+        'search': run_search_benchmarks(args.search),
+        'sqlite_load': [run_sqlite_load(threads) for threads in args.sqlite_load],
+        'instrumentation': run_instrumentation_overhead(),
+        'startup': [] if args.skip_pages else run_startup_benchmarks(args.reruns),
+        'pages': [] if args.skip_pages else run_page_benchmarks(args.catalog, args.intake, args.history, args.reruns),
+    }
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
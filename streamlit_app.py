@@ -1,121 +1,1003 @@
 import streamlit as st
+import cProfile
+import functools
+import heapq
+import io
 import json
+import math
+import os
+import queue
+import re
+import secrets
+import pstats
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
 from datetime import datetime, date, timedelta
-from typing import Dict, List, Any
-import pandas as pd
-import plotly.graph_objects as go
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, List, Any, Mapping, MutableMapping, Optional, Tuple
+import numpy as np
 from zoneinfo import ZoneInfo
 
+# pandas dan plotly hanya diimpor di fungsi/halaman yang memakainya agar cold start
+# dan halaman ringan (profil, tambah asupan satuan) tidak ikut menanggung impornya.
+if TYPE_CHECKING:
+    import pandas as pd
+    import plotly.graph_objects as go
+
+# ==============================================================================
+# INSTRUMENTASI (AKTIF BILA GLUPAL_METRICS=1)
+# ==============================================================================
+
+METRICS_ENABLED = os.environ.get("GLUPAL_METRICS", "").lower() in ("1", "true", "yes", "on")
+METRICS_FILE = os.environ.get("GLUPAL_METRICS_FILE")  # *.json -> JSON, selain itu format teks Prometheus
+METRICS_EXPORT_INTERVAL = 10.0
+
+class _Span:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+_NULL_SPAN = nullcontext()
+
+class Metrics:
+    """Span waktu dan counter sederhana, dibagi oleh semua sesi dalam satu proses.
+
+    Saat nonaktif, span() mengembalikan context manager kosong yang sama dan
+    incr() langsung kembali, jadi biaya di jalur panas hanya satu pengecekan flag.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.spans: Dict[str, List[float]] = {}  # nama -> [jumlah, total detik, maks detik]
+        self.counters: Dict[str, float] = defaultdict(float)
+        self._exported_at = float('-inf')
+
+    def span(self, name: str):
+        if not self.enabled: return _NULL_SPAN
+        return _Span(self, name)
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                self.spans[name] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+
+    def incr(self, name: str, value: float = 1) -> None:
+        if not self.enabled: return
+        with self._lock:
+            self.counters[name] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'spans': {name: {'count': int(count), 'total_s': total, 'max_s': peak} for name, (count, total, peak) in self.spans.items()},
+                'counters': dict(self.counters),
+            }
+
+    def to_prometheus(self) -> str:
+        snap = self.snapshot()
+        label = lambda name: name.replace('\\', '\\\\').replace('"', '\\"')
+        lines = ['# TYPE glupal_span_seconds summary']
+        for name, stats in sorted(snap['spans'].items()):
+            lines.append(f'glupal_span_seconds_count{{span="{label(name)}"}} {stats["count"]}')
+            lines.append(f'glupal_span_seconds_sum{{span="{label(name)}"}} {stats["total_s"]:.6f}')
+        lines.append('# TYPE glupal_span_seconds_max gauge')
+        for name, stats in sorted(snap['spans'].items()):
+            lines.append(f'glupal_span_seconds_max{{span="{label(name)}"}} {stats["max_s"]:.6f}')
+        lines.append('# TYPE glupal_events_total counter')
+        for name, value in sorted(snap['counters'].items()):
+            lines.append(f'glupal_events_total{{name="{label(name)}"}} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path: str, force: bool = False) -> bool:
+        """Menulis metrik ke file (paling sering sekali per METRICS_EXPORT_INTERVAL).
+
+        Hanya satu sesi yang lolos throttle per interval; file ditulis lewat file
+        sementara unik di direktori yang sama lalu os.replace. Gagal tulis hanya
+        menambah counter 'metrics.export_errors' agar rerun tidak ikut gagal.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._exported_at < METRICS_EXPORT_INTERVAL: return False
+            self._exported_at = now
+        text = json.dumps(self.snapshot(), indent=2) if path.endswith('.json') else self.to_prometheus()
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except OSError:
+            if tmp_path and os.path.exists(tmp_path): os.unlink(tmp_path)
+            self.incr('metrics.export_errors')
+            return False
+        return True
+
+@st.cache_resource(show_spinner=False)
+def _shared_metrics(enabled: bool) -> Metrics:
+    return Metrics(enabled)
+
+_metrics_state: Dict[str, Optional[Metrics]] = {'metrics': None}
+
+def get_metrics() -> Metrics:
+    """Objek Metrics bersama untuk proses ini."""
+    if _metrics_state['metrics'] is None:
+        _metrics_state['metrics'] = _shared_metrics(METRICS_ENABLED)
+    return _metrics_state['metrics']
+
+def timed(name: str):
+    """Dekorator span untuk method; saat instrumentasi nonaktif fungsi dikembalikan apa adanya."""
+    def decorate(fn):
+        if not METRICS_ENABLED: return fn
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with get_metrics().span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def render_debug_panel(metrics: Metrics):
+    """Panel debug di sidebar: ringkasan span, counter, ekspor, dan profil satu rerun."""
+    with st.expander("🛠️ Debug Metrik"):
+        snap = metrics.snapshot()
+        if snap['spans']:
+            import pandas as pd
+            st.dataframe(pd.DataFrame([
+                {'span': name, 'n': stats['count'], 'rata2 (ms)': stats['total_s'] / stats['count'] * 1000, 'maks (ms)': stats['max_s'] * 1000, 'total (s)': stats['total_s']}
+                for name, stats in sorted(snap['spans'].items(), key=lambda item: -item[1]['total_s'])
+            ]), hide_index=True, use_container_width=True)
+        st.json(snap['counters'], expanded=False)
+        st.download_button("Unduh metrik (Prometheus)", metrics.to_prometheus(), file_name="glupal_metrics.prom")
+        if st.button("Profil rerun berikutnya (cProfile)"):
+            st.session_state['profile_next_rerun'] = True
+        if st.session_state.get('last_profile'):
+            st.code(st.session_state['last_profile'], language=None)
+
+
+# ==============================================================================
+# KATALOG MAKANAN (DIBAGI OLEH SEMUA SESI)
+# ==============================================================================
+
+FOOD_DATABASE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "food_database.json")
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _load_food_database(version: float, path: str = FOOD_DATABASE_FILE) -> Mapping[str, Mapping[str, Any]]:
+    """Memuat katalog dari file JSON. Di-cache per proses untuk setiap versi file."""
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    # Dibungkus MappingProxyType agar tidak ada sesi yang bisa mengubah katalog bersama.
+    return MappingProxyType({key: MappingProxyType(info) for key, info in raw.items()})
+
+# Memo ringan per eksekusi skrip di atas st.cache_resource: konversi satuan dan
+# lookup katalog dipanggil di jalur panas, jadi mtime file dicek paling sering
+# sekali per detik dan hasil cache_resource disimpan selama versinya sama.
+_catalog_state: Dict[str, Any] = {'version': None, 'checked_at': float('-inf'), 'memo': {}}
+
+def food_database_version() -> float:
+    """Versi katalog = waktu modifikasi file; berubah saat file diedit (hot-reload)."""
+    now = time.monotonic()
+    if now - _catalog_state['checked_at'] >= 1.0:
+        version = os.path.getmtime(FOOD_DATABASE_FILE)
+        if version != _catalog_state['version']:
+            _catalog_state['version'] = version
+            _catalog_state['memo'].clear()
+        _catalog_state['checked_at'] = now
+    return _catalog_state['version']
+
+def _catalog_resource(builder):
+    """Mengembalikan builder(versi) dari memo; bila belum ada, dari cache_resource."""
+    version = food_database_version()
+    memo = _catalog_state['memo']
+    if builder not in memo:
+        memo[builder] = builder(version)
+    return memo[builder]
+
+def get_food_database() -> Mapping[str, Mapping[str, Any]]:
+    """Mengembalikan katalog makanan bersama untuk versi file saat ini."""
+    return _catalog_resource(_load_food_database)
+
+
+def _normalize_food_name(text: str) -> str:
+    """Menormalkan nama/kata kunci: huruf kecil, '_' dan tanda baca menjadi spasi."""
+    cleaned = ''.join(ch if ch.isalnum() else ' ' for ch in text.lower())
+    return ' '.join(cleaned.split())
+
+def _trigrams(text: str) -> set:
+    """Trigram per kata dengan padding spasi, agar kata pendek tetap terindeks."""
+    grams = set()
+    for word in text.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class FoodSearchIndex:
+    """Indeks pencarian katalog: nama ternormalisasi, prefix kata, dan trigram.
+
+    Dibangun sekali per versi katalog lalu dipakai bersama oleh semua sesi.
+    Pencarian substring dijawab lewat irisan posting list trigram (bukan scan
+    linear), dan bila tidak ada yang cocok, jatuh ke pencocokan fuzzy berbasis
+    jumlah trigram yang sama sehingga salah ketik seperti "bobba" tetap ketemu.
+    Posting list disimpan sebagai array NumPy terurut, jadi irisan dan hitungan
+    trigram bersama berjalan di NumPy, bukan loop Python per kandidat.
+    """
+    FUZZY_MIN_COVERAGE = 0.5
+
+    def __init__(self, keys):
+        pairs = sorted((_normalize_food_name(key), key) for key in keys)
+        self.names: List[str] = [name for name, _ in pairs]
+        self.keys: List[str] = [key for _, key in pairs]
+        # Kunci yang hanya beda tanda baca bernama sama setelah dinormalkan; labelnya diberi
+        # kunci asli karena selectbox Streamlit memetakan pilihan lewat label yang ditampilkan.
+        name_counts = Counter(self.names)
+        self.display_names: List[str] = [name.title() if name_counts[name] == 1 else f"{name.title()} ({key})" for name, key in pairs]
+        self.display_name_of: Dict[str, str] = dict(zip(self.keys, self.display_names))
+        gram_counts: List[int] = []
+        grams_by_name: Dict[str, List[int]] = {}
+        self._prefixes: Dict[str, List[int]] = {}
+        for idx, name in enumerate(self.names):
+            grams = _trigrams(name)
+            gram_counts.append(len(grams))
+            for gram in grams:
+                grams_by_name.setdefault(gram, []).append(idx)
+            prefixes = {word[:n] for word in name.split() for n in (1, 2)}
+            for prefix in prefixes:
+                self._prefixes.setdefault(prefix, []).append(idx)
+        self._gram_counts = np.array(gram_counts, dtype=np.int32)
+        self._grams: Dict[str, np.ndarray] = {gram: np.array(posting, dtype=np.int32) for gram, posting in grams_by_name.items()}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def search(self, query: str, limit: int = None) -> List[int]:
+        """Mengembalikan indeks item yang cocok, diurutkan dari yang paling relevan."""
+        q = _normalize_food_name(query)
+        if not q:
+            return list(range(len(self.names)))[:limit]
+        hits = self._substring_hits(q, limit) or self._fuzzy_hits(q, limit)
+        return hits[:limit]
+
+    def _substring_hits(self, q: str, limit: int = None) -> List[int]:
+        # Trigram tanpa padding dari tiap kata pasti ada di nama yang memuat q.
+        query_grams = {word[i:i + 3] for word in q.split() for i in range(len(word) - 2)}
+        if len(q) < 3:
+            candidates = self._prefixes.get(q, [])
+        elif not query_grams:
+            candidates = [idx for idx, name in enumerate(self.names) if q in name]
+        else:
+            postings = []
+            for gram in query_grams:
+                posting = self._grams.get(gram)
+                if posting is None:
+                    return []
+                postings.append(posting)
+            postings.sort(key=len)
+            common = postings[0]
+            for posting in postings[1:]:
+                common = np.intersect1d(common, posting, assume_unique=True)
+                if not len(common):
+                    return []
+            candidates = [idx for idx in common.tolist() if q in self.names[idx]]
+        def rank(idx):
+            name = self.names[idx]
+            if name == q: return (0, idx)
+            if name.startswith(q): return (1, idx)
+            if f" {q}" in f" {name}": return (2, idx)
+            return (3, idx)
+        if limit is not None:
+            return heapq.nsmallest(limit, candidates, key=rank)
+        return sorted(candidates, key=rank)
+
+    def _fuzzy_hits(self, q: str, limit: int = None) -> List[int]:
+        query_grams = _trigrams(q)
+        postings = [self._grams[gram] for gram in query_grams if gram in self._grams]
+        if not postings: return []
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.names))
+        candidates = np.flatnonzero(shared >= self.FUZZY_MIN_COVERAGE * len(query_grams))
+        count = shared[candidates]
+        # Urutan: cakupan trigram kueri, lalu koefisien Dice, lalu urutan nama.
+        dice = 2 * count / (len(query_grams) + self._gram_counts[candidates])
+        order = np.lexsort((candidates, -dice, -count))
+        return candidates[order[:limit]].tolist()
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_food_search_index(version: float) -> FoodSearchIndex:
+    """Membangun indeks pencarian untuk satu versi katalog."""
+    return FoodSearchIndex(get_food_database().keys())
+
+def get_food_search_index() -> FoodSearchIndex:
+    """Mengembalikan indeks pencarian bersama untuk versi katalog saat ini."""
+    return _catalog_resource(_build_food_search_index)
+
+
+CATALOG_PAGE_SIZES = [25, 50, 100, 250]
+# Hasil pencarian teratas yang dikirim ke selectbox "Tambah Asupan" (bukan seluruh katalog).
+INTAKE_SEARCH_LIMIT = 50
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_food_catalog_frame(version: float) -> 'pd.DataFrame':
+    """Katalog sebagai DataFrame berindeks kunci makanan, untuk join tervektorisasi."""
+    import pandas as pd
+    database = get_food_database()
+    frame = pd.DataFrame.from_dict({key: dict(info) for key, info in database.items()}, orient='index')
+    frame['nama'] = [_normalize_food_name(key).title() for key in frame.index]
+    if 'kategori' not in frame: frame['kategori'] = 'lainnya'
+    frame['kategori'] = frame['kategori'].fillna('lainnya')
+    return frame
+
+INTAKE_COLUMN_ALIASES = {'food': 'makanan', 'nama': 'makanan', 'amount': 'jumlah', 'unit': 'satuan', 'timestamp': 'waktu', 'time': 'waktu'}
+
+def read_intake_file(source, filename: Optional[str] = None) -> 'pd.DataFrame':
+    """Membaca log asupan dari CSV atau Parquet (path atau file upload)."""
+    import pandas as pd
+    name = (filename or getattr(source, 'name', None) or str(source)).lower()
+    if name.endswith(('.parquet', '.pq')):
+        return pd.read_parquet(source)
+    return pd.read_csv(source)
+
+# Teks waktu yang membawa zona sendiri (…Z, …+07:00, …-0300).
+_TZ_SUFFIX = r'(?:[zZ]|[+-]\d{2}:?\d{2})$'
+# Angka di kolom waktu dibaca sebagai detik epoch Unix; di luar 2000–2100 dianggap salah
+# (mis. epoch milidetik), karena datetime.fromtimestamp akan gagal untuk tahun sejauh itu.
+EPOCH_SECONDS_RANGE = (946684800, 4102444800)
+
+def _local_seconds(naive: 'pd.Series') -> np.ndarray:
+    """Waktu tanpa zona → detik epoch menurut aturan zona lokal (termasuk DST) pada tanggal itu.
+
+    Seperti datetime.fromtimestamp di sisi baca, konversi lewat datetime.timestamp()
+    (mktime), cukup sekali per nilai unik.
+    """
+    import pandas as pd
+    codes, uniques = pd.factorize(naive)  # NaT → -1
+    seconds = np.array([moment.to_pydatetime().timestamp() for moment in uniques] + [np.nan])
+    return seconds[codes]
+
+def parse_intake_times(values: 'pd.Series') -> np.ndarray:
+    """Kolom waktu → detik epoch (float), NaN untuk nilai yang tidak dikenali.
+
+    Per baris: angka = detik epoch, teks dengan offset dikonversi lewat UTC (offset
+    boleh berbeda antarbaris), teks/tanggal tanpa zona dianggap waktu lokal server.
+    Tidak pernah melempar exception; baris gagal ditandai NaN untuk laporan error.
+    """
+    import pandas as pd
+    to_seconds = lambda moments: ((moments - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)).to_numpy(dtype=float, na_value=np.nan)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return _local_seconds(values) if values.dt.tz is None else to_seconds(values)
+    seconds = np.full(len(values), np.nan)
+    numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    is_epoch = (numbers >= EPOCH_SECONDS_RANGE[0]) & (numbers <= EPOCH_SECONDS_RANGE[1])
+    seconds[is_epoch] = numbers[is_epoch]
+    is_text = np.isnan(numbers) & values.notna().to_numpy()
+    text = values[is_text].astype(str).str.strip()
+    aware = text.str.contains(_TZ_SUFFIX, regex=True).to_numpy()
+    positions = np.flatnonzero(is_text)
+    if aware.any():
+        seconds[positions[aware]] = to_seconds(pd.to_datetime(text[aware], utc=True, errors='coerce', format='mixed'))
+    if (~aware).any():
+        naive = pd.to_datetime(text[~aware], errors='coerce', format='mixed')
+        seconds[positions[~aware]] = _local_seconds(naive)
+    return seconds
+
+def get_food_catalog_frame() -> 'pd.DataFrame':
+    """Mengembalikan DataFrame katalog bersama (jangan diubah, hanya dibaca)."""
+    return _catalog_resource(_build_food_catalog_frame)
+
+UNIT_ALIASES = {
+    'g': 'gram', 'gr': 'gram', 'gram': 'gram', 'mililiter': 'ml', 'cc': 'ml',
+    'sdt': 'sendok teh', 'sdm': 'sendok makan', 'pcs': 'buah', 'biji': 'buah',
+    'iris': 'potong', 'lbr': 'lembar', 'btl': 'botol', 'mangkok': 'mangkuk', 'gls': 'gelas',
+}
+# Batas berat satu entri; di atasnya dianggap salah ketik (dan centigram gula tetap muat di int64).
+MAX_GRAMS_PER_ENTRY = 50_000
+
+class UnitTable:
+    """Tabel konversi padat makanan × satuan berisi gram per 1 satuan.
+
+    Setiap makanan hanya punya satuan dari katalognya sendiri: gram, satuan
+    umum, satuan tambahan di 'satuan' ({nama: gram}), dan ml bila makanan cair
+    punya 'densitas' (gram per ml). Tidak ada berat generik lintas makanan;
+    sel NaN berarti satuan tidak berlaku untuk makanan tersebut.
+    """
+
+    def __init__(self, database: Mapping[str, Mapping[str, Any]]):
+        self.food_keys: List[str] = list(database)
+        self.food_index: Dict[str, int] = {key: i for i, key in enumerate(self.food_keys)}
+        units = {'gram', 'ml'}
+        for info in database.values():
+            units.add(info['satuan_umum'])
+            units.update(info.get('satuan', {}))
+        self.units: List[str] = sorted(units)
+        self.unit_index: Dict[str, int] = {unit: i for i, unit in enumerate(self.units)}
+        grams = np.full((len(self.food_keys), len(self.units)), np.nan)
+        grams[:, self.unit_index['gram']] = 1.0
+        for i, info in enumerate(database.values()):
+            if 'densitas' in info: grams[i, self.unit_index['ml']] = info['densitas']
+            grams[i, self.unit_index[info['satuan_umum']]] = info.get('berat_satuan_umum', 0)
+            for unit, weight in info.get('satuan', {}).items():
+                grams[i, self.unit_index[unit]] = weight
+        grams.setflags(write=False)
+        self.grams = grams
+        self._units_for = {
+            key: tuple(self.units[j] for j in np.flatnonzero(~np.isnan(grams[i])))
+            for i, key in enumerate(self.food_keys)
+        }
+
+    def resolve_unit(self, satuan: str) -> Optional[str]:
+        """Nama satuan kanonik (alias seperti 'sdm' → 'sendok makan'), atau None."""
+        if satuan in self.unit_index: return satuan
+        unit = ' '.join(str(satuan).lower().split())
+        unit = UNIT_ALIASES.get(unit, unit)
+        return unit if unit in self.unit_index else None
+
+    def grams_per_unit(self, food_key: str, satuan: str) -> float:
+        """Gram per 1 satuan; NaN bila makanan/satuan tidak dikenal."""
+        unit = self.resolve_unit(satuan)
+        i = self.food_index.get(food_key)
+        if unit is None or i is None: return np.nan
+        return self.grams.item(i, self.unit_index[unit])
+
+    def units_for(self, food_key: str) -> Tuple[str, ...]:
+        """Satuan yang berlaku untuk makanan ini (urut abjad)."""
+        return self._units_for.get(food_key, ('gram',))
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_unit_table(version: float) -> UnitTable:
+    return UnitTable(get_food_database())
+
+def get_unit_table() -> UnitTable:
+    """Mengembalikan tabel konversi bersama untuk versi katalog saat ini."""
+    return _catalog_resource(_build_unit_table)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_food_catalog_table(version: float) -> 'pd.DataFrame':
+    """Tabel katalog siap tampil, barisnya searah dengan urutan FoodSearchIndex."""
+    import pandas as pd
+    database = get_food_database()
+    keys = get_food_search_index().keys
+    return pd.DataFrame({
+        'Makanan': get_food_search_index().display_names,
+        'Gula / 100g (g)': [database[key]['gula_per_100'] for key in keys],
+        'Satuan Umum': [database[key]['satuan_umum'] for key in keys],
+        'Berat Satuan (g)': [database[key]['berat_satuan_umum'] for key in keys],
+    })
+
+def get_food_catalog_table() -> 'pd.DataFrame':
+    """Mengembalikan tabel katalog bersama (jangan diubah, hanya dibaca)."""
+    return _catalog_resource(_build_food_catalog_table)
+
+
+# ==============================================================================
+# PENYIMPANAN RIWAYAT (SESSION ATAU SQLITE)
+# ==============================================================================
+
+HISTORY_BACKEND = os.environ.get("GLUPAL_HISTORY_BACKEND", "sqlite")
+HISTORY_DB_FILE = os.environ.get("GLUPAL_HISTORY_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "glupal_history.db"))
+
+class HistorySeries:
+    """Riwayat dalam bentuk kolom: tanggal datetime64[D] terurut + kolom float.
+
+    Urutan tanggal dijaga saat penyisipan, sehingga pemilihan rentang cukup
+    dua kali searchsorted (O(log n)) dan hasil slice bisa langsung dipakai
+    sebagai sumbu x/y Plotly tanpa parsing string atau lookup dict.
+    """
+    COLUMNS = ('total_gula', 'limit_kemenkes', 'limit_aha')
+
+    def __init__(self, dates=None, total_gula=None, limit_kemenkes=None, limit_aha=None):
+        self.dates = np.asarray(dates if dates is not None else [], dtype='datetime64[D]')
+        self.total_gula = np.asarray(total_gula if total_gula is not None else [], dtype=float)
+        self.limit_kemenkes = np.asarray(limit_kemenkes if limit_kemenkes is not None else [], dtype=float)
+        self.limit_aha = np.asarray(limit_aha if limit_aha is not None else [], dtype=float)
+
+    @classmethod
+    def from_rows(cls, rows) -> "HistorySeries":
+        """Membangun seri dari baris (tanggal, total_gula, limit_kemenkes, limit_aha)."""
+        rows = list(rows)
+        if not rows: return cls()
+        days, totals, kemenkes, aha = zip(*rows)
+        series = cls(days, totals, [np.nan if v is None else v for v in kemenkes], [np.nan if v is None else v for v in aha])
+        if np.any(series.dates[1:] < series.dates[:-1]):
+            order = np.argsort(series.dates, kind='stable')
+            for column in ('dates',) + cls.COLUMNS:
+                setattr(series, column, getattr(series, column)[order])
+        return series
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def upsert(self, day, record: Dict[str, Any]) -> None:
+        """Menyisipkan/menimpa satu hari tanpa merusak urutan tanggal."""
+        day = np.datetime64(day, 'D')
+        values = [np.nan if record.get(column) is None else record[column] for column in self.COLUMNS]
+        pos = int(np.searchsorted(self.dates, day))
+        if pos < len(self.dates) and self.dates[pos] == day:
+            for column, value in zip(self.COLUMNS, values):
+                getattr(self, column)[pos] = value
+            return
+        self.dates = np.insert(self.dates, pos, day)
+        for column, value in zip(self.COLUMNS, values):
+            setattr(self, column, np.insert(getattr(self, column), pos, value))
+
+    def slice(self, start=None, end=None) -> "HistorySeries":
+        """Mengambil rentang start..end (inklusif) sebagai view, tanpa menyalin data."""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, 'D'), side='left'))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, 'D'), side='right'))
+        return HistorySeries(self.dates[lo:hi], self.total_gula[lo:hi], self.limit_kemenkes[lo:hi], self.limit_aha[lo:hi])
+
+    def bounds(self) -> Optional[Tuple[date, date]]:
+        if not len(self.dates): return None
+        return self.dates[0].astype(date), self.dates[-1].astype(date)
+
+    def aggregate(self, resolution: str) -> Dict[str, np.ndarray]:
+        """Agregasi per periode ('harian', 'mingguan', 'bulanan').
+
+        Menghasilkan awal periode, jumlah/rata-rata/maksimum gula harian, jumlah
+        hari tercatat, dan jumlah hari yang melewati batas AHA/Kemenkes saat itu.
+        """
+        if resolution == 'bulanan':
+            keys = self.dates.astype('datetime64[M]').astype('datetime64[D]')
+        elif resolution == 'mingguan':
+            # 1970-01-01 jatuh pada hari Kamis; geser agar minggu dimulai Senin.
+            keys = self.dates - (self.dates.astype(np.int64) + 3) % 7
+        else:
+            keys = self.dates
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.int64)
+        if not len(starts):
+            empty = np.array([], dtype=float)
+            return {'periods': keys, 'total': empty, 'mean': empty, 'max': empty, 'days': empty, 'over_aha': empty, 'over_kemenkes': empty}
+        with np.errstate(invalid='ignore'):
+            over_aha = (self.total_gula > self.limit_aha).astype(np.int64)
+            over_kemenkes = (self.total_gula > self.limit_kemenkes).astype(np.int64)
+        total = np.add.reduceat(self.total_gula, starts)
+        days = np.diff(np.r_[starts, len(keys)])
+        return {
+            'periods': keys[starts],
+            'total': total,
+            'mean': total / days,
+            'max': np.maximum.reduceat(self.total_gula, starts),
+            'days': days,
+            'over_aha': np.add.reduceat(over_aha, starts),
+            'over_kemenkes': np.add.reduceat(over_kemenkes, starts),
+        }
+
+def choose_history_resolution(n_days: int) -> str:
+    """Resolusi otomatis: harian s.d. 3 bulan, mingguan s.d. 2 tahun, selebihnya bulanan."""
+    if n_days <= 92: return 'harian'
+    if n_days <= 731: return 'mingguan'
+    return 'bulanan'
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indeks titik yang mempertahankan bentuk kurva."""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        area = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(np.argmax(area))
+        selected[i + 1] = prev
+    return selected
+
+class HistoryStorage(ABC):
+    """Antarmuka penyimpanan riwayat harian. Tanggal berformat 'YYYY-MM-DD'."""
+
+    @abstractmethod
+    def save_day(self, user_id: str, day: str, record: Dict[str, Any]) -> None:
+        """Menyimpan (atau menimpa) ringkasan satu hari milik user_id."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_range(self, user_id: str, start: Optional[str] = None, end: Optional[str] = None) -> HistorySeries:
+        """Memuat riwayat start..end (inklusif) sebagai HistorySeries terurut."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def date_bounds(self, user_id: str) -> Optional[Tuple[str, str]]:
+        """Tanggal pertama dan terakhir yang tersimpan, atau None jika kosong."""
+        raise NotImplementedError
+
+class SessionHistoryStorage(HistoryStorage):
+    """Riwayat di st.session_state (perilaku lama: hilang saat sesi berakhir)."""
+
+    def __init__(self, state: Optional[MutableMapping] = None):
+        self._state = st.session_state if state is None else state
+
+    def _series(self, user_id: str) -> HistorySeries:
+        if 'history_data' not in self._state:
+            self._state['history_data'] = {}
+        return self._state['history_data'].setdefault(user_id, HistorySeries())
+
+    def save_day(self, user_id, day, record):
+        self._series(user_id).upsert(day, record)
+
+    def load_range(self, user_id, start=None, end=None):
+        return self._series(user_id).slice(start, end)
+
+    def date_bounds(self, user_id):
+        bounds = self._series(user_id).bounds()
+        return tuple(day.strftime('%Y-%m-%d') for day in bounds) if bounds else None
+
+class SQLiteHistoryStorage(HistoryStorage):
+    """Riwayat di SQLite (mode WAL) dengan pool koneksi yang dibagi antar sesi.
+
+    WAL membuat pembaca tidak pernah memblokir penulis; penulisan sendiri tetap
+    diserialisasi oleh SQLite, jadi setiap transaksi dibuat sesingkat mungkin
+    (satu upsert) dan busy_timeout menangani antrean singkat antar penulis.
+    """
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS history (
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            total_gula REAL NOT NULL,
+            limit_kemenkes REAL,
+            limit_aha REAL,
+            PRIMARY KEY (user_id, date)
+        ) WITHOUT ROWID
+    """
+
+    def __init__(self, path: str, pool_size: int = 8, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=pool_size)
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(self._SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def save_day(self, user_id, day, record):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO history (user_id, date, total_gula, limit_kemenkes, limit_aha) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_id, date) DO UPDATE SET total_gula = excluded.total_gula, "
+                "limit_kemenkes = excluded.limit_kemenkes, limit_aha = excluded.limit_aha",
+                (user_id, day, record['total_gula'], record.get('limit_kemenkes'), record.get('limit_aha')),
+            )
+
+    def load_range(self, user_id, start=None, end=None):
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT date, total_gula, limit_kemenkes, limit_aha FROM history "
+                "WHERE user_id = ? AND date >= ? AND date <= ? ORDER BY date",
+                (user_id, start or '0000-00-00', end or '9999-99-99'),
+            ).fetchall()
+        return HistorySeries.from_rows(rows)
+
+    def date_bounds(self, user_id):
+        with self._connection() as conn:
+            # Dua subkueri terpisah: MIN/MAX tunggal dijawab dari ujung indeks (user_id, date),
+            # sedangkan MIN dan MAX dalam satu SELECT memindai semua baris milik user_id.
+            first, last = conn.execute(
+                "SELECT (SELECT MIN(date) FROM history WHERE user_id = ?), (SELECT MAX(date) FROM history WHERE user_id = ?)",
+                (user_id, user_id),
+            ).fetchone()
+        return (first, last) if first is not None else None
+
+@st.cache_resource(show_spinner=False)
+def _shared_sqlite_storage(path: str) -> SQLiteHistoryStorage:
+    """Satu instance (dan satu pool koneksi) per file database per proses."""
+    return SQLiteHistoryStorage(path)
+
+def get_history_storage() -> HistoryStorage:
+    """Memilih backend riwayat sesuai GLUPAL_HISTORY_BACKEND ('sqlite' atau 'session')."""
+    if HISTORY_BACKEND == "session":
+        return SessionHistoryStorage()
+    return _shared_sqlite_storage(HISTORY_DB_FILE)
+
+# Belum ada login, jadi riwayat dikunci pada id acak (128 bit) yang dibawa di URL (?uid=),
+# bukan pada nama profil: nama mudah ditebak dan bisa diganti kapan saja.
+HISTORY_USER_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{22,64}')
+
+def new_history_user_id() -> str:
+    return secrets.token_urlsafe(16)
+
+def session_history_user_id() -> str:
+    """Id riwayat dari query param ?uid=; bila kosong/tidak valid, dibuat baru dan ditulis ke URL."""
+    uid = st.query_params.get('uid', '')
+    if not HISTORY_USER_ID_PATTERN.fullmatch(uid):
+        uid = new_history_user_id()
+        st.query_params['uid'] = uid
+    return uid
+
+
 # ==============================================================================
 # KELAS LOGIKA BISNIS (MENGGUNAKAN st.session_state)
 # ==============================================================================
 
+class RenderCache:
+    """Memo hasil render per sesi dengan satu slot per jenis artefak dan penghitung hit/miss.
+
+    Tiap slot hanya menyimpan (key, nilai) terakhir; key berisi versi data dan
+    parameter tampilan. Saat versi naik, nilai lama diganti, bukan ditumpuk,
+    jadi sesi tidak pernah menahan tabel/grafik basi dari versi sebelumnya.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._slots: Dict[str, Tuple[Any, Any]] = {}
+
+    def get_or_build(self, kind: str, key, build):
+        """Mengembalikan nilai slot `kind` bila key-nya sama; selain itu build() menggantikannya."""
+        slot = self._slots.get(kind)
+        if slot is not None and slot[0] == key:
+            self.hits += 1
+            get_metrics().incr('render_cache.hits')
+            return slot[1]
+        self.misses += 1
+        get_metrics().incr('render_cache.misses')
+        # Nilai lama dilepas sebelum build() agar dua versi tidak hidup bersamaan.
+        self._slots.pop(kind, None)
+        value = build()
+        self._slots[kind] = (key, value)
+        return value
+
+    def clear(self) -> None:
+        """Mengosongkan semua slot (penghitung hit/miss tetap)."""
+        self._slots.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+class IntakeLog:
+    """Log asupan append-only berbasis array dengan total berjalan.
+
+    Gula disimpan dalam centigram (int) sehingga total per hari, per jam, dan
+    per kategori bisa ditambah/dikurangi dalam O(1) tanpa galat pembulatan.
+    Menghapus entri hanya menandainya tidak aktif; id entri tidak pernah berubah.
+    """
+
+    def __init__(self):
+        self._timestamps = array('d')
+        self._amounts = array('d')
+        self._sugar_cg = array('q')
+        self._name_ids = array('l')
+        self._unit_ids = array('l')
+        self._category_ids = array('l')
+        self._active = bytearray()
+        self._strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        self.total_cg = 0
+        self.count = 0
+        self.by_day: Dict[date, int] = defaultdict(int)
+        self.by_hour: Dict[Tuple[date, int], int] = defaultdict(int)
+        self.by_category: Dict[str, int] = defaultdict(int)
+
+    def _intern(self, text: str) -> int:
+        if text not in self._string_ids:
+            self._string_ids[text] = len(self._strings)
+            self._strings.append(text)
+        return self._string_ids[text]
+
+    def _apply(self, entry_id: int, sign: int) -> None:
+        moment = datetime.fromtimestamp(self._timestamps[entry_id])
+        sugar = sign * self._sugar_cg[entry_id]
+        self.total_cg += sugar
+        self.count += sign
+        self.by_day[moment.date()] += sugar
+        self.by_hour[(moment.date(), moment.hour)] += sugar
+        self.by_category[self._strings[self._category_ids[entry_id]]] += sugar
+
+    def append(self, nama: str, jumlah: float, satuan: str, gula_gram: float, kategori: str = 'lainnya', timestamp: Optional[float] = None) -> int:
+        """Menambah satu entri dan mengembalikan id-nya."""
+        entry_id = len(self._active)
+        self._timestamps.append(time.time() if timestamp is None else timestamp)
+        self._amounts.append(jumlah)
+        self._sugar_cg.append(round(gula_gram * 100))
+        self._name_ids.append(self._intern(nama))
+        self._unit_ids.append(self._intern(satuan))
+        self._category_ids.append(self._intern(kategori))
+        self._active.append(1)
+        self._apply(entry_id, +1)
+        return entry_id
+
+    def extend(self, names, amounts, units, sugar_gram, categories, timestamps) -> range:
+        """Menambah banyak entri sekaligus (kolom numpy/pandas) dan mengembalikan id-nya."""
+        import pandas as pd  # factorize berbasis hash; np.unique harus mengurutkan objek str
+        start = len(self._active)
+        n = len(amounts)
+        sugar_cg = np.rint(np.asarray(sugar_gram, dtype=float) * 100).astype(np.int64)
+        timestamps = np.asarray(timestamps, dtype=float)
+        self._timestamps.frombytes(timestamps.astype('d').tobytes())
+        self._amounts.frombytes(np.asarray(amounts, dtype=float).astype('d').tobytes())
+        self._sugar_cg.frombytes(sugar_cg.astype('q').tobytes())
+        for column, values in ((self._name_ids, names), (self._unit_ids, units), (self._category_ids, categories)):
+            codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+            ids = np.array([self._intern(text) for text in uniques], dtype=np.int64)
+            column.extend(ids[codes].tolist())
+        self._active.extend(b'\x01' * n)
+        self.total_cg += int(sugar_cg.sum())
+        self.count += n
+        # Total per hari/jam dihitung per blok 15 menit (aman untuk offset zona waktu
+        # non-jam penuh), jadi konversi ke waktu lokal hanya dilakukan per blok unik.
+        blocks, block_idx = np.unique(timestamps // 900, return_inverse=True)
+        block_sums = np.bincount(block_idx, weights=sugar_cg, minlength=len(blocks))
+        for block, total in zip(blocks, block_sums):
+            moment = datetime.fromtimestamp(block * 900)
+            self.by_day[moment.date()] += int(total)
+            self.by_hour[(moment.date(), moment.hour)] += int(total)
+        category_idx, categories = pd.factorize(np.asarray(categories, dtype=object))
+        for category, total in zip(categories, np.bincount(category_idx, weights=sugar_cg, minlength=len(categories))):
+            self.by_category[category] += int(total)
+        return range(start, start + n)
+
+    def remove(self, entry_id: int) -> bool:
+        """Menonaktifkan entri; total dikurangi tanpa menghitung ulang."""
+        if not 0 <= entry_id < len(self._active) or not self._active[entry_id]:
+            return False
+        self._apply(entry_id, -1)
+        self._active[entry_id] = 0
+        return True
+
+    def update(self, entry_id: int, jumlah: float, satuan: str, gula_gram: float) -> bool:
+        """Mengubah jumlah/satuan/gula sebuah entri aktif."""
+        if not 0 <= entry_id < len(self._active) or not self._active[entry_id]:
+            return False
+        self._apply(entry_id, -1)
+        self._amounts[entry_id] = jumlah
+        self._unit_ids[entry_id] = self._intern(satuan)
+        self._sugar_cg[entry_id] = round(gula_gram * 100)
+        self._apply(entry_id, +1)
+        return True
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def total_gula(self) -> float:
+        return self.total_cg / 100
+
+    def total_for_day(self, day: date) -> float:
+        return self.by_day.get(day, 0) / 100
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Entri aktif sebagai daftar dict (untuk tabel tampilan)."""
+        return [
+            {'id': entry_id, 'nama': self._strings[self._name_ids[entry_id]], 'jumlah': self._amounts[entry_id],
+             'satuan': self._strings[self._unit_ids[entry_id]], 'gula_gram': self._sugar_cg[entry_id] / 100,
+             'waktu': datetime.fromtimestamp(self._timestamps[entry_id]).strftime('%Y-%m-%d %H:%M:%S')}
+            for entry_id in range(len(self._active)) if self._active[entry_id]
+        ]
+
 class SugarTracker:
     # --- PERBAIKAN PENTING: Nama method harus __init__ ---
-    def __init__(self):
-        """Inisialisasi tracker dengan nilai default, database, dan riwayat."""
+    def __init__(self, storage: Optional[HistoryStorage] = None, user_id: Optional[str] = None):
+        """Inisialisasi tracker dengan nilai default, database, dan penyimpanan riwayat."""
         self.kemenkes_limit = 50
         self.aha_limits = {
             'pria_dewasa': 36,
             'wanita_dewasa': 25,
             'anak': 25
         }
-        self._initialize_database()
-        self.daily_intake: List[Dict] = []
+        self.intake_log = IntakeLog()
         self.user_profile: Dict = {}
-        
-        # --- PERUBAHAN 1: Hapus referensi ke file JSON ---
-        # self.history_file = "gula_check_history.json"
-        
-        # Muat riwayat dari st.session_state
-        self.history = self._load_history()
-
-    # --- PERUBAHAN 2: Muat riwayat dari st.session_state ---
-    def _load_history(self) -> Dict:
-        """Memuat riwayat konsumsi dari session_state."""
-        if 'history_data' not in st.session_state:
-            st.session_state['history_data'] = {}
-        return st.session_state['history_data']
-
-    # --- PERUBAHAN 3: Simpan riwayat (implisit) ---
-    def _save_history(self):
-        """Menyimpan data riwayat ke session_state (sudah otomatis)."""
-        # Tidak ada tindakan yang diperlukan karena self.history menunjuk
-        # langsung ke st.session_state['history_data']. Perubahan sudah tersimpan.
-        pass
+        # Riwayat tidak lagi disimpan di memori sesi; dibaca per rentang dari storage.
+        self.storage = storage if storage is not None else get_history_storage()
+        # Kunci riwayat di storage; tidak ikut berubah saat nama profil diganti.
+        self.user_id = user_id or new_history_user_id()
+        # Versi data: naik setiap kali asupan, profil, atau riwayat berubah.
+        # Grafik dan tabel di-memo pada (versi, parameter) di render_cache, satu slot per jenis.
+        self.version = 0
+        self.render_cache = RenderCache()
+
+    def _load_history(self, start: Optional[date] = None, end: Optional[date] = None) -> HistorySeries:
+        """Memuat riwayat konsumsi pada rentang tanggal tertentu dari storage."""
+        return self.storage.load_range(
+            self.user_id,
+            start.strftime('%Y-%m-%d') if start else None,
+            end.strftime('%Y-%m-%d') if end else None,
+        )
+
+    def _save_history(self, day: str, record: Dict[str, Any]):
+        """Menyimpan ringkasan satu hari ke storage."""
+        self.storage.save_day(self.user_id, day, record)
+
+    @property
+    def history(self) -> HistorySeries:
+        """Seluruh riwayat pengguna. Untuk tampilan, gunakan get_history(start, end)."""
+        return self._load_history()
+
+    @timed('tracker.get_history')
+    def get_history(self, start: Optional[date] = None, end: Optional[date] = None) -> HistorySeries:
+        """Riwayat start..end (inklusif); .dates dan .total_gula siap dipakai Plotly."""
+        return self._load_history(start, end)
 
+    @timed('tracker.history_bounds')
+    def history_bounds(self) -> Optional[Tuple[date, date]]:
+        """Tanggal pertama dan terakhir di riwayat, atau None bila belum ada riwayat."""
+        bounds = self.storage.date_bounds(self.user_id)
+        if bounds is None: return None
+        return tuple(datetime.strptime(day, '%Y-%m-%d').date() for day in bounds)
+
+    @timed('tracker.archive_and_reset_day')
     def archive_and_reset_day(self):
-        """Mengarsipkan total hari ini ke riwayat dan mereset asupan."""
-        total_gula = self.calculate_daily_sugar()
-        if total_gula > 0 and self.user_profile:
-            today_str = date.today().strftime('%Y-%m-%d')
-            limits = self.get_recommended_limit()
-            aha_limit_value = limits.get('aha') if isinstance(limits.get('aha'), (int, float)) else 0
-            # Modifikasi ini langsung mengubah st.session_state['history_data']
-            self.history[today_str] = {
-                'total_gula': round(total_gula, 2),
-                'limit_kemenkes': limits.get('kemenkes'),
-                'limit_aha': aha_limit_value
-            }
-            self._save_history() # Panggilan ini sekarang tidak melakukan apa-apa
-        self.reset_daily_intake()
-
-    def _initialize_database(self):
-        """Menginisialisasi database makanan dengan daftar lengkap."""
-        self.food_database = {
-            'teh_manis': {'gula_per_100': 10.0, 'satuan_umum': 'gelas', 'berat_satuan_umum': 200}, 'kopi_manis': {'gula_per_100': 8.0, 'satuan_umum': 'cangkir', 'berat_satuan_umum': 150},
-            'es_teh_manis': {'gula_per_100': 12.0, 'satuan_umum': 'gelas', 'berat_satuan_umum': 250}, 'es_coklat': {'gula_per_100': 15.0, 'satuan_umum': 'gelas', 'berat_satuan_umum': 300},
-            'sirup': {'gula_per_100': 65.0, 'satuan_umum': 'sendok makan', 'berat_satuan_umum': 15}, 'soda_cola': {'gula_per_100': 10.6, 'satuan_umum': 'kaleng', 'berat_satuan_umum': 330},
-            'sprite': {'gula_per_100': 9.5, 'satuan_umum': 'kaleng', 'berat_satuan_umum': 330}, 'coca_cola_zero': {'gula_per_100': 0.0, 'satuan_umum': 'kaleng', 'berat_satuan_umum': 330},
-            'jus_jeruk_kemasan': {'gula_per_100': 9.0, 'satuan_umum': 'kotak', 'berat_satuan_umum': 200}, 'minuman_energi': {'gula_per_100': 11.0, 'satuan_umum': 'kaleng', 'berat_satuan_umum': 250},
-            'teh_kotak': {'gula_per_100': 8.5, 'satuan_umum': 'kotak', 'berat_satuan_umum': 200}, 'kopi_instan_sachet': {'gula_per_100': 50.0, 'satuan_umum': 'sachet', 'berat_satuan_umum': 20},
-            'minuman_isotonik': {'gula_per_100': 6.0, 'satuan_umum': 'botol', 'berat_satuan_umum': 500}, 'susu_uht_full_cream': {'gula_per_100': 4.5, 'satuan_umum': 'kotak', 'berat_satuan_umum': 250},
-            'susu_coklat': {'gula_per_100': 9.0, 'satuan_umum': 'kotak', 'berat_satuan_umum': 200}, 'yogurt_drink': {'gula_per_100': 11.0, 'satuan_umum': 'botol', 'berat_satuan_umum': 200},
-            'susu_kedelai_kemasan': {'gula_per_100': 7.0, 'satuan_umum': 'kotak', 'berat_satuan_umum': 200}, 'air_kelapa_kemasan': {'gula_per_100': 6.0, 'satuan_umum': 'kotak', 'berat_satuan_umum': 250},
-            'boba_milk_tea': {'gula_per_100': 18.0, 'satuan_umum': 'cup', 'berat_satuan_umum': 400}, 'es_kopi_susu_gula_aren': {'gula_per_100': 15.0, 'satuan_umum': 'cup', 'berat_satuan_umum': 250},
-            'thai_tea': {'gula_per_100': 16.0, 'satuan_umum': 'cup', 'berat_satuan_umum': 300}, 'cheese_tea': {'gula_per_100': 14.0, 'satuan_umum': 'cup', 'berat_satuan_umum': 350},
-            'matcha_latte': {'gula_per_100': 17.0, 'satuan_umum': 'cup', 'berat_satuan_umum': 350}, 'dalgano_coffee': {'gula_per_100': 18.0, 'satuan_umum': 'cup', 'berat_satuan_umum': 300},
-            'coklat_batang': {'gula_per_100': 47.0, 'satuan_umum': 'batang', 'berat_satuan_umum': 50}, 'brownies_coklat': {'gula_per_100': 40.0, 'satuan_umum': 'potong', 'berat_satuan_umum': 60},
-            'permen': {'gula_per_100': 85.0, 'satuan_umum': 'buah', 'berat_satuan_umum': 5}, 'kue_donat': {'gula_per_100': 25.0, 'satuan_umum': 'buah', 'berat_satuan_umum': 50},
-            'es_krim': {'gula_per_100': 21.0, 'satuan_umum': 'scoop', 'berat_satuan_umum': 60}, 'biskuit_manis': {'gula_per_100': 25.0, 'satuan_umum': 'keping', 'berat_satuan_umum': 10},
-            'cake_coklat': {'gula_per_100': 35.0, 'satuan_umum': 'potong', 'berat_satuan_umum': 60}, 'cookies': {'gula_per_100': 30.0, 'satuan_umum': 'keping', 'berat_satuan_umum': 15},
-            'pudding': {'gula_per_100': 18.0, 'satuan_umum': 'cup', 'berat_satuan_umum': 120}, 'jelly': {'gula_per_100': 17.0, 'satuan_umum': 'cup', 'berat_satuan_umum': 100},
-            'marshmallow': {'gula_per_100': 81.0, 'satuan_umum': 'buah', 'berat_satuan_umum': 7}, 'muffin': {'gula_per_100': 25.0, 'satuan_umum': 'buah', 'berat_satuan_umum': 90},
-            'croissant_coklat': {'gula_per_100': 20.0, 'satuan_umum': 'buah', 'berat_satuan_umum': 70}, 'keripik_kentang_rasa': {'gula_per_100': 4.0, 'satuan_umum': 'bungkus kecil', 'berat_satuan_umum': 25},
-            'wafer_coklat': {'gula_per_100': 35.0, 'satuan_umum': 'batang', 'berat_satuan_umum': 20}, 'biskuit_krim': {'gula_per_100': 28.0, 'satuan_umum': 'keping', 'berat_satuan_umum': 15},
-            'apel': {'gula_per_100': 10.4, 'satuan_umum': 'buah', 'berat_satuan_umum': 180}, 'pisang': {'gula_per_100': 12.2, 'satuan_umum': 'buah', 'berat_satuan_umum': 120},
-            'jeruk': {'gula_per_100': 9.4, 'satuan_umum': 'buah', 'berat_satuan_umum': 130}, 'mangga': {'gula_per_100': 13.7, 'satuan_umum': 'buah', 'berat_satuan_umum': 200},
-            'anggur': {'gula_per_100': 16.3, 'satuan_umum': 'mangkuk', 'berat_satuan_umum': 150}, 'strawberry': {'gula_per_100': 4.9, 'satuan_umum': 'mangkuk', 'berat_satuan_umum': 150},
-            'semangka': {'gula_per_100': 6.2, 'satuan_umum': 'potong', 'berat_satuan_umum': 280}, 'pepaya': {'gula_per_100': 5.9, 'satuan_umum': 'potong', 'berat_satuan_umum': 150},
-            'nanas': {'gula_per_100': 9.9, 'satuan_umum': 'potong', 'berat_satuan_umum': 100}, 'melon': {'gula_per_100': 8.1, 'satuan_umum': 'potong', 'berat_satuan_umum': 150},
-            'kurma': {'gula_per_100': 63.0, 'satuan_umum': 'buah', 'berat_satuan_umum': 7}, 'roti_tawar': {'gula_per_100': 5.0, 'satuan_umum': 'lembar', 'berat_satuan_umum': 25},
-            'roti_manis': {'gula_per_100': 12.0, 'satuan_umum': 'buah', 'berat_satuan_umum': 60}, 'sereal_manis': {'gula_per_100': 30.0, 'satuan_umum': 'mangkuk', 'berat_satuan_umum': 40},
-            'granola': {'gula_per_100': 20.0, 'satuan_umum': 'mangkuk', 'berat_satuan_umum': 50}, 'yogurt_buah': {'gula_per_100': 12.0, 'satuan_umum': 'cup', 'berat_satuan_umum': 125},
-            'selai_strawberry': {'gula_per_100': 48.0, 'satuan_umum': 'sendok makan', 'berat_satuan_umum': 20}, 'selai_kacang': {'gula_per_100': 9.0, 'satuan_umum': 'sendok makan', 'berat_satuan_umum': 16},
-            'madu': {'gula_per_100': 82.0, 'satuan_umum': 'sendok makan', 'berat_satuan_umum': 21}, 'gula_pasir': {'gula_per_100': 100.0, 'satuan_umum': 'sendok teh', 'berat_satuan_umum': 4},
-            'gula_merah': {'gula_per_100': 85.0, 'satuan_umum': 'sendok makan', 'berat_satuan_umum': 15}, 'susu_kental_manis': {'gula_per_100': 54.0, 'satuan_umum': 'sendok makan', 'berat_satuan_umum': 20},
-            'klepon': {'gula_per_100': 30.0, 'satuan_umum': 'buah', 'berat_satuan_umum': 20}, 'onde_onde': {'gula_per_100': 25.0, 'satuan_umum': 'buah', 'berat_satuan_umum': 40},
-            'es_cendol': {'gula_per_100': 20.0, 'satuan_umum': 'gelas', 'berat_satuan_umum': 300}, 'es_doger': {'gula_per_100': 22.0, 'satuan_umum': 'mangkuk', 'berat_satuan_umum': 250},
-            'kolak': {'gula_per_100': 18.0, 'satuan_umum': 'mangkuk', 'berat_satuan_umum': 250}, 'bubur_sumsum': {'gula_per_100': 14.0, 'satuan_umum': 'mangkuk', 'berat_satuan_umum': 200},
-            'martabak_manis': {'gula_per_100': 22.0, 'satuan_umum': 'potong', 'berat_satuan_umum': 75}, 'kue_lapis': {'gula_per_100': 28.0, 'satuan_umum': 'potong', 'berat_satuan_umum': 40},
-            'dodol': {'gula_per_100': 60.0, 'satuan_umum': 'potong', 'berat_satuan_umum': 20}, 'wingko': {'gula_per_100': 30.0, 'satuan_umum': 'buah', 'berat_satuan_umum': 50},
-            'serabi': {'gula_per_100': 18.0, 'satuan_umum': 'buah', 'berat_satuan_umum': 60}, 'getuk': {'gula_per_100': 30.0, 'satuan_umum': 'potong', 'berat_satuan_umum': 50},
-            'kue_putu': {'gula_per_100': 25.0, 'satuan_umum': 'buah', 'berat_satuan_umum': 25}, 'nasi_putih': {'gula_per_100': 0.1, 'satuan_umum': 'porsi', 'berat_satuan_umum': 200},
-            'nasi_goreng': {'gula_per_100': 4.0, 'satuan_umum': 'porsi', 'berat_satuan_umum': 350}, 'mie_goreng_instan': {'gula_per_100': 8.0, 'satuan_umum': 'porsi', 'berat_satuan_umum': 120},
-            'bubur_ayam': {'gula_per_100': 2.0, 'satuan_umum': 'porsi', 'berat_satuan_umum': 350}, 'lontong_sayur': {'gula_per_100': 5.0, 'satuan_umum': 'porsi', 'berat_satuan_umum': 450},
-            'nasi_uduk': {'gula_per_100': 1.5, 'satuan_umum': 'porsi', 'berat_satuan_umum': 300}, 'ayam_goreng': {'gula_per_100': 1.0, 'satuan_umum': 'potong', 'berat_satuan_umum': 150},
-            'rendang_daging': {'gula_per_100': 3.0, 'satuan_umum': 'potong', 'berat_satuan_umum': 50}, 'sate_ayam': {'gula_per_100': 10.0, 'satuan_umum': 'porsi', 'berat_satuan_umum': 150},
-            'bakso': {'gula_per_100': 3.0, 'satuan_umum': 'porsi', 'berat_satuan_umum': 400}, 'soto_ayam': {'gula_per_100': 2.0, 'satuan_umum': 'porsi', 'berat_satuan_umum': 400},
-            'gado_gado': {'gula_per_100': 12.0, 'satuan_umum': 'porsi', 'berat_satuan_umum': 400}, 'ikan_bakar': {'gula_per_100': 7.0, 'satuan_umum': 'porsi', 'berat_satuan_umum': 200},
-            'ayam_bakar': {'gula_per_100': 9.0, 'satuan_umum': 'potong', 'berat_satuan_umum': 150}, 'burger': {'gula_per_100': 5.0, 'satuan_umum': 'buah', 'berat_satuan_umum': 250},
-            'kentang_goreng': {'gula_per_100': 0.5, 'satuan_umum': 'porsi', 'berat_satuan_umum': 110}, 'pizza': {'gula_per_100': 3.6, 'satuan_umum': 'slice', 'berat_satuan_umum': 100},
-            'fried_chicken': {'gula_per_100': 0.2, 'satuan_umum': 'potong', 'berat_satuan_umum': 120}, 'kecap_manis': {'gula_per_100': 60.0, 'satuan_umum': 'sendok makan', 'berat_satuan_umum': 15},
-            'saus_tomat_botolan': {'gula_per_100': 22.0, 'satuan_umum': 'sendok makan', 'berat_satuan_umum': 15}, 'saus_sambal_botolan': {'gula_per_100': 15.0, 'satuan_umum': 'sendok makan', 'berat_satuan_umum': 15},
-            'mayonnaise': {'gula_per_100': 4.0, 'satuan_umum': 'sendok makan', 'berat_satuan_umum': 15},
-        }
+        """Mengarsipkan total log per tanggal ke riwayat dan mereset asupan."""
+        days = [day for day, total_cg in self.intake_log.by_day.items() if total_cg > 0]
+        if days and self.user_profile:
+            self._add_to_history(np.array(days, dtype='datetime64[D]'), np.array([self.intake_log.total_for_day(day) for day in days]))
+        self.reset_daily_intake()  # juga menaikkan versi, termasuk untuk riwayat yang baru disimpan
+
+    def _add_to_history(self, days: np.ndarray, gula: np.ndarray):
+        """Menambahkan gula per tanggal ke ringkasan riwayat (dijumlah dengan yang sudah ada).
+
+        Hari yang sudah tersimpan mempertahankan batasnya; hari baru memakai batas profil saat ini.
+        """
+        days, day_idx = np.unique(days, return_inverse=True)
+        totals = np.bincount(day_idx, weights=gula, minlength=len(days))
+        existing = self._load_history(days[0].astype(date), days[-1].astype(date))
+        stored = {day: (total, kemenkes, aha) for day, total, kemenkes, aha in zip(
+            existing.dates.tolist(), existing.total_gula.tolist(), existing.limit_kemenkes.tolist(), existing.limit_aha.tolist())}
+        limits = self.get_recommended_limit()
+        aha_limit_value = limits.get('aha') if isinstance(limits.get('aha'), (int, float)) else 0
+        for day, total in zip(days.tolist(), totals.tolist()):
+            previous, kemenkes, aha = stored.get(day, (0.0, limits.get('kemenkes'), aha_limit_value))
+            self._save_history(day.strftime('%Y-%m-%d'), {
+                'total_gula': round(previous + total, 2),
+                'limit_kemenkes': kemenkes,
+                'limit_aha': aha
+            })
 
+    @property
+    def daily_intake(self) -> List[Dict[str, Any]]:
+        """Asupan aktif hari ini sebagai daftar dict (dibangun dari intake_log)."""
+        return self.intake_log.records()
+
+    @property
+    def food_database(self) -> Mapping[str, Mapping[str, Any]]:
+        """Katalog makanan bersama (read-only) yang dimuat sekali per proses."""
+        return get_food_database()
+
+    @timed('tracker.set_user_profile')
     def set_user_profile(self, nama: str, umur: int, jenis_kelamin: str, berat_badan: float):
         self.user_profile = {'nama': nama, 'umur': umur, 'jenis_kelamin': jenis_kelamin.lower(), 'berat_badan': berat_badan, 'kategori': self._determine_category(umur, jenis_kelamin)}
+        self.version += 1
     def _determine_category(self, umur: int, jenis_kelamin: str) -> str:
         if umur < 18: return 'anak'
         return 'pria_dewasa' if jenis_kelamin.lower() == 'pria' else 'wanita_dewasa'
@@ -123,37 +1005,131 @@ class SugarTracker:
         if not self.user_profile: return {'kemenkes': self.kemenkes_limit, 'aha': 'Profil belum diatur'}
         kategori = self.user_profile['kategori']
         return {'kemenkes': self.kemenkes_limit, 'aha': self.aha_limits.get(kategori)}
-    def add_food_item(self, nama_makanan: str, jumlah: float, satuan: str):
-        normalized_food_name = nama_makanan.lower().strip().replace(" ", "_")
+    def _food_key(self, nama_makanan: str) -> str:
+        """Kunci katalog apa adanya, atau nama tampilan ('Teh Manis') yang dinormalkan ke kunci."""
+        if nama_makanan in self.food_database: return nama_makanan
+        return nama_makanan.lower().strip().replace(" ", "_")
+    def _to_grams(self, food_key: str, jumlah: float, satuan: str):
+        """Mengonversi jumlah+satuan ke gram lewat UnitTable. Mengembalikan (gram, pesan_error)."""
+        grams_per_unit = get_unit_table().grams_per_unit(food_key, satuan)
+        if math.isnan(grams_per_unit): return None, f"❌ Satuan '{satuan}' tidak berlaku untuk makanan ini. Pilih: {', '.join(get_unit_table().units_for(food_key))}."
+        jumlah_gram = jumlah * grams_per_unit
+        if not math.isfinite(jumlah_gram) or jumlah_gram <= 0: return None, f"❌ Tidak dapat menghitung berat."
+        if jumlah_gram > MAX_GRAMS_PER_ENTRY: return None, f"❌ Berat melebihi {MAX_GRAMS_PER_ENTRY:,} g per entri."
+        return jumlah_gram, None
+    @timed('tracker.add_food_item')
+    def add_food_item(self, nama_makanan: str, jumlah: float, satuan: str, timestamp: Optional[float] = None):
+        normalized_food_name = self._food_key(nama_makanan)
         if normalized_food_name not in self.food_database: return False, f"❌ Makanan '{nama_makanan}' tidak ditemukan."
         food_info = self.food_database[normalized_food_name]
-        jumlah_gram = 0
-        if satuan in ['gram', 'ml']: jumlah_gram = jumlah
-        elif satuan == food_info.get('satuan_umum'): jumlah_gram = jumlah * food_info.get('berat_satuan_umum', 0)
+        jumlah_gram, error = self._to_grams(normalized_food_name, jumlah, satuan)
+        if error: return False, error
+        satuan = get_unit_table().resolve_unit(satuan)
+        total_gula = (food_info['gula_per_100'] * jumlah_gram) / 100
+        nama = _normalize_food_name(normalized_food_name).title()
+        self.intake_log.append(nama, jumlah, satuan, round(total_gula, 2), food_info.get('kategori', 'lainnya'), timestamp)
+        self.version += 1
+        return True, f"✅ Berhasil ditambahkan: **{nama}** ({total_gula:.2f}g gula)."
+    @timed('tracker.add_food_items')
+    def add_food_items(self, data) -> Tuple[int, 'pd.DataFrame']:
+        """Menambah banyak asupan sekaligus dari DataFrame (atau file CSV/Parquet).
+
+        Kolom: makanan, jumlah, satuan, dan opsional waktu (nama kolom Inggris
+        food/amount/unit/timestamp juga diterima). Makanan dan satuan di-resolve
+        lewat join ke katalog dan gula dihitung dengan NumPy. Baris hari ini masuk
+        ke log harian, baris dari hari sebelumnya langsung ke riwayat per tanggal,
+        dan baris bertanggal di masa depan ditolak. Mengembalikan
+        (jumlah baris yang ditambahkan, laporan error per baris).
+        """
+        import pandas as pd
+        frame = data if isinstance(data, pd.DataFrame) else read_intake_file(data)
+        frame = frame.rename(columns=lambda c: INTAKE_COLUMN_ALIASES.get(str(c).strip().lower(), str(c).strip().lower()))
+        missing = [c for c in ('makanan', 'jumlah', 'satuan') if c not in frame]
+        if missing:
+            return 0, pd.DataFrame({'baris': [0], 'makanan': [None], 'error': [f"❌ Kolom wajib tidak ada: {', '.join(missing)}."]})
+        catalog, units = get_food_catalog_frame(), get_unit_table()
+        raw_keys = frame['makanan'].astype(str).str.strip()
+        keys = raw_keys.where(raw_keys.isin(catalog.index), raw_keys.str.lower().str.replace(r'\s+', '_', regex=True))
+        satuan = frame['satuan'].astype(str).str.lower().str.strip().str.replace(r'\s+', ' ', regex=True).replace(UNIT_ALIASES)
+        jumlah = pd.to_numeric(frame['jumlah'], errors='coerce').to_numpy(dtype=float)
+        foods = catalog.reindex(keys.to_numpy())
+        found = foods['gula_per_100'].notna().to_numpy()
+        food_idx = keys.map(units.food_index).to_numpy(dtype=float)
+        unit_idx = satuan.map(units.unit_index).to_numpy(dtype=float)
+        known = ~np.isnan(food_idx) & ~np.isnan(unit_idx)
+        factor = np.full(len(frame), np.nan)
+        factor[known] = units.grams[food_idx[known].astype(np.intp), unit_idx[known].astype(np.intp)]
+        jumlah_gram = jumlah * factor
+        now = time.time()
+        if 'waktu' in frame:
+            timestamps = parse_intake_times(frame['waktu'])
+            bad_time = frame['waktu'].notna().to_numpy() & np.isnan(timestamps)
+            timestamps = np.where(np.isnan(timestamps), now, timestamps)
         else:
-            factors = {'sendok teh': 5, 'sendok makan': 15, 'cup': 240, 'scoop': 60, 'keping': 10, 'buah': 120, 'potong': 50, 'lembar': 25, 'porsi': 200, 'gelas': 250, 'cangkir': 150, 'kaleng': 330, 'kotak': 200, 'botol': 500, 'sachet': 20, 'mangkuk': 250, 'slice': 100}
-            if satuan in factors: jumlah_gram = jumlah * factors[satuan]
-            else: return False, f"❌ Satuan '{satuan}' tidak umum. Coba 'gram' atau 'ml'."
-        if jumlah_gram <= 0: return False, f"❌ Tidak dapat menghitung berat."
+            timestamps = np.full(len(frame), now)
+            bad_time = np.zeros(len(frame), dtype=bool)
+        # Tanggal lokal per baris; konversi zona waktu cukup sekali per blok 15 menit unik.
+        blocks, block_idx = np.unique(timestamps // 900, return_inverse=True)
+        row_days = np.array([datetime.fromtimestamp(block * 900).date() for block in blocks], dtype='datetime64[D]')[block_idx]
+        today = np.datetime64(date.today(), 'D')
+        errors = np.select(
+            [~found, np.isnan(jumlah) | (jumlah <= 0), np.isnan(factor), bad_time, row_days > today, ~(jumlah_gram > 0), ~(jumlah_gram <= MAX_GRAMS_PER_ENTRY)],
+            ["❌ Makanan tidak ditemukan.", "❌ Jumlah harus angka > 0.", "❌ Satuan tidak berlaku untuk makanan ini.", "❌ Format waktu tidak dikenali.", "❌ Waktu berada di masa depan.", "❌ Tidak dapat menghitung berat.", f"❌ Berat melebihi {MAX_GRAMS_PER_ENTRY:,} g per entri."],
+            default='',
+        )
+        valid = errors == ''
+        gula = np.round(foods['gula_per_100'].to_numpy(dtype=float) * jumlah_gram / 100, 2)
+        is_today, is_past = valid & (row_days == today), valid & (row_days < today)
+        if is_today.any():
+            self.intake_log.extend(foods['nama'].to_numpy()[is_today], jumlah[is_today], satuan.to_numpy()[is_today], gula[is_today], foods['kategori'].to_numpy()[is_today], timestamps[is_today])
+        if is_past.any():
+            self._add_to_history(row_days[is_past], gula[is_past])
+        if valid.any(): self.version += 1
+        report = pd.DataFrame({'baris': np.flatnonzero(~valid) + 1, 'makanan': frame['makanan'].to_numpy()[~valid], 'error': errors[~valid]})
+        return int(valid.sum()), report
+
+    @timed('tracker.remove_food_item')
+    def remove_food_item(self, entry_id: int) -> bool:
+        """Menghapus satu entri asupan berdasarkan id-nya."""
+        removed = self.intake_log.remove(entry_id)
+        if removed: self.version += 1
+        return removed
+    @timed('tracker.update_food_item')
+    def update_food_item(self, entry_id: int, nama_makanan: str, jumlah: float, satuan: str):
+        """Mengubah jumlah/satuan sebuah entri; total diperbarui secara inkremental."""
+        food_key = self._food_key(nama_makanan)
+        food_info = self.food_database.get(food_key)
+        if food_info is None: return False, f"❌ Makanan '{nama_makanan}' tidak ditemukan."
+        jumlah_gram, error = self._to_grams(food_key, jumlah, satuan)
+        if error: return False, error
+        satuan = get_unit_table().resolve_unit(satuan)
         total_gula = (food_info['gula_per_100'] * jumlah_gram) / 100
-        item = {'nama': nama_makanan.title(), 'jumlah': jumlah, 'satuan': satuan, 'gula_gram': round(total_gula, 2), 'waktu': datetime.now().strftime('%H:%M:%S')}
-        self.daily_intake.append(item)
-        return True, f"✅ Berhasil ditambahkan: **{item['nama']}** ({total_gula:.2f}g gula)."
-    def calculate_daily_sugar(self) -> float:
-        return sum(item['gula_gram'] for item in self.daily_intake)
-    def reset_daily_intake(self): self.daily_intake = []
+        if not self.intake_log.update(entry_id, jumlah, satuan, round(total_gula, 2)): return False, "❌ Entri tidak ditemukan."
+        self.version += 1
+        return True, f"✅ Entri diperbarui ({total_gula:.2f}g gula)."
+    @timed('tracker.calculate_daily_sugar')
+    def calculate_daily_sugar(self, day: Optional[date] = None) -> float:
+        """Total gula di log (atau hanya pada `day`), O(1) dari total berjalan."""
+        if day is not None: return self.intake_log.total_for_day(day)
+        return self.intake_log.total_gula
+    def reset_daily_intake(self):
+        self.intake_log = IntakeLog()
+        self.version += 1
 
 
 # ==============================================================================
 # --- UI STREAMLIT (Sama seperti versi terbaik sebelumnya) ---
 # ==============================================================================
-# Inisialisasi Aplikasi
-if 'tracker' not in st.session_state:
-    st.session_state.tracker = SugarTracker()
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
 
-st.set_page_config(page_title="GluPal", page_icon="🍬", layout="wide")
+def static_asset(name: str) -> str:
+    """URL aset lokal di static/ (disajikan server, di-cache browser); tanpa static serving, path file-nya."""
+    if st.get_option('server.enableStaticServing'): return f"/app/static/{name}"
+    return os.path.join(STATIC_DIR, name)
 
-st.markdown("""
+# Hanya berisi <style>, jadi st.html mengirimnya ke event container (tidak memakan ruang di halaman).
+# Tetap dikirim tiap rerun: elemen yang tidak dikirim ulang akan dihapus Streamlit di akhir rerun.
+APP_CSS = """
 <style>
     :root {
         --bg-color: #FFFFFF; --card-bg-color: #F0F8FF; --text-color: #0d1117; --secondary-text-color: #555;
@@ -180,7 +1156,7 @@ st.markdown("""
     .stButton>button:hover { opacity: 0.8; border-color: var(--sugar-color); }
     [data-testid="stSidebar"] { background-color: var(--card-bg-color); }
 </style>
-""", unsafe_allow_html=True)
+"""
 
 def get_greeting():
     wib_timezone = ZoneInfo("Asia/Jakarta")
@@ -191,34 +1167,45 @@ def get_greeting():
     elif 15 <= hour < 19: return "Selamat Sore 🌇"
     else: return "Selamat Malam 🌙"
 
+HISTORY_RESOLUTIONS = {"Otomatis": None, "Harian": 'harian', "Mingguan": 'mingguan', "Bulanan": 'bulanan'}
+MAX_CHART_POINTS = 400
+
+def build_history_figure(history: HistorySeries, aha, kemenkes, resolution: str, use_webgl: bool = False) -> 'go.Figure':
+    """Grafik riwayat teragregasi; batas AHA/Kemenkes digambar sebagai garis shape."""
+    import plotly.graph_objects as go
+    agg = history.aggregate(resolution)
+    keep = lttb_indices(agg['periods'].astype(np.int64), agg['mean'], MAX_CHART_POINTS)
+    label = {'harian': 'Gula', 'mingguan': 'Rata-rata/hari (minggu)', 'bulanan': 'Rata-rata/hari (bulan)'}[resolution]
+    customdata = np.column_stack([agg['total'][keep], agg['max'][keep], agg['days'][keep], agg['over_aha'][keep], agg['over_kemenkes'][keep]])
+    hovertemplate = f'<b>%{{x}}</b><br>{label}: %{{y:.1f}} g'
+    if resolution != 'harian':
+        hovertemplate += '<br>Total: %{customdata[0]:.1f} g<br>Maks/hari: %{customdata[1]:.1f} g<br>Hari tercatat: %{customdata[2]}'
+    hovertemplate += '<br>Hari > AHA: %{customdata[3]} · Hari > Kemenkes: %{customdata[4]}<extra></extra>'
+    scatter = go.Scattergl if use_webgl else go.Scatter
+    shapes, annotations = [], []
+    # Garis batas dibuat langsung sebagai shape di layout (lebih ringan daripada add_hline).
+    for value, name, color, dash in ((aha, 'AHA', 'var(--aha-color)', 'dash'), (kemenkes, 'Kemenkes', 'var(--kemenkes-color)', 'longdash')):
+        if isinstance(value, (int, float)):
+            shapes.append(dict(type='line', xref='paper', x0=0, x1=1, yref='y', y0=value, y1=value, line=dict(color=color, dash=dash)))
+            annotations.append(dict(xref='paper', x=0, yref='y', y=value, text=f'Batas {name} ({value}g)', showarrow=False, xanchor='left', yanchor='bottom'))
+    trace = scatter(x=agg['periods'][keep], y=agg['mean'][keep], customdata=customdata, mode='lines+markers', name='Konsumsi Gula', line=dict(color='var(--sugar-color)', width=4), hovertemplate=hovertemplate)
+    layout = dict(title_text=f"Grafik Konsumsi Gula ({resolution})", xaxis_title="Tanggal", yaxis_title="Jumlah Gula (g)", plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font=dict(color="var(--text-color)"), yaxis=dict(gridcolor='rgba(128,128,128,0.2)'), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1), hovermode="x unified", shapes=shapes, annotations=annotations)
+    return go.Figure(data=[trace], layout=layout)
+
 def colored_progress_bar(progress, bar_color_var):
     st.markdown(f"""
     <div style="background-color: var(--progress-track-color); border-radius: 10px; padding: 3px;">
         <div style="background-color: {bar_color_var}; width: {min(progress * 100, 100)}%; height: 22px; border-radius: 7px; text-align: center; color: white; font-weight: bold; line-height: 22px;">{int(progress * 100)}%</div>
     </div>""", unsafe_allow_html=True)
 
-with st.sidebar:
-    st.image("https://cdn-icons-png.flaticon.com/128/11748/11748885.png", width=100)
-    st.title("GluPal")
-    if 'tracker' in st.session_state and st.session_state.tracker.user_profile:
-        user_name = st.session_state.tracker.user_profile.get('nama', "Pengguna")
-    else:
-        user_name = "Pengguna"
-    st.write(f"Halo, **{user_name}**!")
-    menu_options = {"👤 Profil Pengguna": "Profil Pengguna","➕ Tambah Asupan": "Tambah Asupan","🏠 Laporan Harian": "Laporan Harian","📊 Riwayat & Grafik": "Riwayat & Grafik","📚 Database Makanan": "Database Makanan"}
-    selection = st.radio("Menu Navigasi:", options=menu_options.keys(), label_visibility="collapsed")
-    menu = menu_options[selection]
-    st.markdown("---")
-    st.info("Pantau gula, jaga kesehatan. Aplikasi ini siap membantumu setiap hari!")
-
-if menu == "Profil Pengguna":
+def render_profile_page():
+    """Halaman profil pengguna dan batas rekomendasi."""
     st.header("👤 Profil Pengguna")
     st.write("Informasi ini digunakan untuk menentukan batas rekomendasi asupan gula harianmu.")
     profile = st.session_state.tracker.user_profile
     col1, col2 = st.columns([1, 2])
     with col1:
-        avatar = "https://cdn-icons-png.flaticon.com/512/3135/3135715.png" if profile.get('jenis_kelamin', 'pria') == 'pria' else "https://cdn-icons-png.flaticon.com/512/3135/3135789.png"
-        st.image(avatar, width=150)
+        st.image(static_asset("avatar_pria.svg" if profile.get('jenis_kelamin', 'pria') == 'pria' else "avatar_wanita.svg"), width=150)
     with col2:
         with st.form("profile_form"):
             nama = st.text_input("Nama Lengkap", value=profile.get('nama', ''))
@@ -233,15 +1220,17 @@ if menu == "Profil Pengguna":
     if profile:
         limits = st.session_state.tracker.get_recommended_limit()
         st.success(f"Batas konsumsi gulamu: **Kemenkes: {limits['kemenkes']}g**, **AHA: {limits['aha']}g** per hari.")
+    st.caption(f"🔑 Riwayatmu tersimpan dengan kode `{st.session_state.tracker.user_id}`. Simpan tautan halaman ini (berisi `?uid=`) untuk membukanya lagi; siapa pun yang memegang tautan ini bisa melihat riwayatmu.")
 
-elif menu == "Laporan Harian":
+def render_daily_report_page():
+    """Halaman ringkasan gula harian."""
     st.title(get_greeting())
     user_name = st.session_state.tracker.user_profile.get('nama', 'Pengguna')
     st.subheader(f"Ini ringkasan gula harianmu, {user_name}.")
     if not st.session_state.tracker.user_profile:
         st.warning("⚠️ Silakan atur profilmu terlebih dahulu di menu 'Profil Pengguna'.")
     else:
-        total_gula = st.session_state.tracker.calculate_daily_sugar()
+        total_gula = st.session_state.tracker.calculate_daily_sugar(date.today())
         limits = st.session_state.tracker.get_recommended_limit()
         col1, col2, col3 = st.columns(3)
         aha_val, kemenkes_val = limits.get('aha', "N/A"), limits.get('kemenkes', "N/A")
@@ -263,77 +1252,171 @@ elif menu == "Laporan Harian":
             if total_gula / kemenkes_val >= 1.0: st.error("MELEBIHI BATAS MAKSIMAL KEMENKES!")
         st.markdown("---")
         st.subheader("Rincian Asupan Hari Ini")
-        if not st.session_state.tracker.daily_intake:
+        if not len(st.session_state.tracker.intake_log):
             st.info("Belum ada asupan yang dicatat.")
         else:
-            st.dataframe(pd.DataFrame(st.session_state.tracker.daily_intake), use_container_width=True, hide_index=True)
+            tracker = st.session_state.tracker
+            def build_intake_table():
+                import pandas as pd
+                with get_metrics().span('intake.build_dataframe'):
+                    return pd.DataFrame(tracker.daily_intake)
+            intake_table = tracker.render_cache.get_or_build('intake_table', tracker.version, build_intake_table)
+            get_metrics().incr('items_rendered.intake_rows', len(intake_table))
+            # Entri dipilih langsung di tabel (tanpa daftar opsi kedua yang ikut membesar per entri).
+            # Key ikut versi agar pilihan baris tidak berpindah ke entri lain setelah data berubah.
+            event = st.dataframe(intake_table, use_container_width=True, hide_index=True, on_select="rerun", selection_mode="single-row", key=f"intake_table_{tracker.version}")
+            if event.selection.rows:
+                entry_id = int(intake_table['id'].iloc[event.selection.rows[0]])
+                if st.button(f"Hapus Entri #{entry_id} · {intake_table['nama'].iloc[event.selection.rows[0]]} 🗑️") and tracker.remove_food_item(entry_id):
+                    st.rerun()
+            else:
+                st.caption("Pilih satu baris di tabel untuk menghapus entri tersebut.")
         if st.button("Simpan & Reset Hari Ini 💾"):
             st.session_state.tracker.archive_and_reset_day()
             st.success("Asupan hari ini berhasil diarsipkan!")
             st.balloons()
             st.rerun()
 
-elif menu == "Tambah Asupan":
+def render_add_intake_page():
+    """Halaman untuk menambah asupan (satu per satu atau impor massal)."""
     st.header("📋 Tambah Asupan Makanan/Minuman")
     if not st.session_state.tracker.user_profile: st.warning("⚠️ Silakan atur profilmu terlebih dahulu.")
     else:
-        food_options = sorted([name.replace('_', ' ').title() for name in st.session_state.tracker.food_database.keys()])
-        nama_makanan = st.selectbox("Langkah 1: Pilih Makanan/Minuman", options=food_options, index=None, placeholder="Ketik untuk mencari...")
-        if nama_makanan:
+        # Pencarian berperingkat yang sama dengan "Database Makanan" (tahan salah ketik); hanya
+        # hasil teratas yang dikirim ke browser. Opsi berupa kunci katalog, bukan nama tampilan.
+        index = get_food_search_index()
+        query = st.text_input("Langkah 1: Cari Makanan/Minuman", placeholder="Contoh: boba, kopi susu")
+        with get_metrics().span('intake.search'):
+            options = [index.keys[i] for i in index.search(query, limit=INTAKE_SEARCH_LIMIT)]
+        if query and not options: st.warning("Makanan tidak ditemukan.")
+        food_key = st.selectbox("Pilih dari hasil pencarian", options=options, index=0 if query and options else None, format_func=index.display_name_of.__getitem__, placeholder="Ketik di kolom pencarian di atas...")
+        if food_key:
             with st.form("add_food_form"):
-                st.markdown(f"#### **{nama_makanan}**")
+                st.markdown(f"#### **{index.display_name_of[food_key]}**")
                 col1, col2 = st.columns(2)
-                jumlah = col1.number_input("Langkah 2: Masukkan Jumlah", min_value=0.1, value=1.0, step=0.1)
-                food_key = nama_makanan.lower().replace(' ', '_')
+                jumlah = col1.number_input("Langkah 2: Masukkan Jumlah", min_value=0.1, max_value=float(MAX_GRAMS_PER_ENTRY), value=1.0, step=0.1)
                 default_unit = st.session_state.tracker.food_database.get(food_key, {}).get('satuan_umum', 'gram')
-                all_units = sorted(['gram', 'ml', 'porsi', 'buah', 'potong', 'lembar', 'sendok makan', 'sendok teh', 'cup', 'gelas', 'kaleng', 'kotak', 'botol', 'sachet', 'mangkuk', 'scoop', 'keping', 'slice'])
+                all_units = get_unit_table().units_for(food_key)
                 try: default_index = all_units.index(default_unit)
                 except ValueError: default_index = 0
                 satuan = col2.selectbox("Langkah 3: Pilih Satuan", options=all_units, index=default_index)
                 if st.form_submit_button("Tambahkan ke Catatan Harian ➕"):
-                    success, message = st.session_state.tracker.add_food_item(nama_makanan, jumlah, satuan)
+                    success, message = st.session_state.tracker.add_food_item(food_key, jumlah, satuan)
                     if success: st.success(message)
                     else: st.error(message)
-                        
-elif menu == "Riwayat & Grafik":
+        with st.expander("📥 Impor Massal (CSV/Parquet)"):
+            st.caption("Kolom: `makanan`, `jumlah`, `satuan`, dan opsional `waktu` (mis. 2024-05-01 07:30). Baris dari hari sebelumnya langsung masuk ke Riwayat.")
+            uploaded = st.file_uploader("Unggah log asupan", type=["csv", "parquet"], label_visibility="collapsed")
+            if uploaded is not None and st.button("Impor Asupan 📥"):
+                try:
+                    added, report = st.session_state.tracker.add_food_items(read_intake_file(uploaded))
+                except Exception as exc:
+                    st.error(f"❌ File tidak dapat dibaca: {exc}")
+                else:
+                    if added: st.success(f"✅ {added} baris berhasil diimpor.")
+                    if len(report):
+                        st.warning(f"{len(report)} baris dilewati:")
+                        st.dataframe(report, use_container_width=True, hide_index=True)
+
+def render_history_page():
+    """Halaman riwayat dan grafik konsumsi gula."""
     st.header("📊 Riwayat & Grafik Konsumsi Gula")
     if not st.session_state.tracker.user_profile: st.warning("⚠️ Atur profil untuk melihat grafik.")
-    elif not st.session_state.tracker.history: st.info("Belum ada riwayat. Gunakan aplikasi dan 'Simpan & Reset' untuk membangun riwayatmu.")
+    elif (history_bounds := st.session_state.tracker.render_cache.get_or_build('history_bounds', (st.session_state.tracker.version, st.session_state.tracker.user_id), st.session_state.tracker.history_bounds)) is None: st.info("Belum ada riwayat. Gunakan aplikasi dan 'Simpan & Reset' untuk membangun riwayatmu.")
     else:
-        all_dates = sorted([datetime.strptime(d, '%Y-%m-%d').date() for d in st.session_state.tracker.history.keys()])
+        first_date, last_date = history_bounds
         with st.expander("🗓️ Filter Riwayat", expanded=True):
             col1, col2 = st.columns(2)
-            start_date = col1.date_input("Mulai", value=max(all_dates[0], date.today() - timedelta(days=6)), min_value=all_dates[0], max_value=all_dates[-1])
-            end_date = col2.date_input("Selesai", value=all_dates[-1], min_value=all_dates[0], max_value=all_dates[-1])
+            start_date = col1.date_input("Mulai", value=max(first_date, min(last_date, date.today() - timedelta(days=6))), min_value=first_date, max_value=last_date)
+            end_date = col2.date_input("Selesai", value=last_date, min_value=first_date, max_value=last_date)
+            col3, col4 = st.columns(2)
+            resolution_choice = col3.selectbox("Resolusi", list(HISTORY_RESOLUTIONS))
+            use_webgl = col4.toggle("Render WebGL (data sangat panjang)", value=False)
         if start_date > end_date: st.error("Error: Tanggal Mulai tidak boleh setelah Tanggal Selesai.")
         else:
-            filtered_dates = [d.strftime('%Y-%m-%d') for d in all_dates if start_date <= d <= end_date]
-            if not filtered_dates: st.warning("Tidak ada data untuk rentang tanggal yang dipilih.")
+            tracker = st.session_state.tracker
+            limits = tracker.get_recommended_limit()
+            aha, kemenkes = limits.get('aha'), limits.get('kemenkes')
+            resolution = HISTORY_RESOLUTIONS[resolution_choice] or choose_history_resolution((end_date - start_date).days + 1)
+            def build_figure():
+                history = tracker.get_history(start_date, end_date)
+                if not len(history): return None
+                with get_metrics().span('history.build_figure'):
+                    return build_history_figure(history, aha, kemenkes, resolution, use_webgl)
+            fig = tracker.render_cache.get_or_build('history_figure', (tracker.version, tracker.user_id, start_date, end_date, resolution, use_webgl, aha, kemenkes), build_figure)
+            if fig is None: st.warning("Tidak ada data untuk rentang tanggal yang dipilih.")
             else:
-                limits = st.session_state.tracker.get_recommended_limit()
-                aha, kemenkes = limits.get('aha'), limits.get('kemenkes')
-                fig = go.Figure()
-                fig.add_trace(go.Scatter(x=filtered_dates, y=[st.session_state.tracker.history[d]['total_gula'] for d in filtered_dates], mode='lines+markers', name='Konsumsi Gula', line=dict(color='var(--sugar-color)', width=4), hovertemplate='<b>%{x}</b><br>Gula: %{y:.1f} g<extra></extra>'))
-                if isinstance(aha, (int, float)):
-                    fig.add_trace(go.Scatter(x=filtered_dates, y=[aha] * len(filtered_dates), mode='lines', name=f'Batas AHA ({aha}g)', line=dict(color='var(--aha-color)', dash='dash'), hoverinfo='skip'))
-                if isinstance(kemenkes, (int, float)):
-                    fig.add_trace(go.Scatter(x=filtered_dates, y=[kemenkes] * len(filtered_dates), mode='lines', name=f'Batas Kemenkes ({kemenkes}g)', line=dict(color='var(--kemenkes-color)', dash='longdash'), hoverinfo='skip'))
-                fig.update_layout(title_text=f"Grafik Konsumsi Gula", xaxis_title="Tanggal", yaxis_title="Jumlah Gula (g)", plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font=dict(color="var(--text-color)"), yaxis=dict(gridcolor='rgba(128,128,128,0.2)'), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1), hovermode="x unified")
+                get_metrics().incr('items_rendered.chart_points', len(fig.data[0].x))
                 st.plotly_chart(fig, use_container_width=True)
-                
-elif menu == "Database Makanan":
+
+def render_food_database_page():
+    """Halaman katalog makanan dengan pencarian dan paginasi."""
     st.header("📚 Database Makanan")
     st.info("Cari makanan dan minuman untuk melihat estimasi kandungan gulanya.")
-    db_instance = st.session_state.tracker
     search_term = st.text_input("Cari makanan...", placeholder="Contoh: Boba Milk Tea")
-    all_items = sorted(db_instance.food_database.keys())
-    if search_term: filtered_items = [k for k in all_items if search_term.lower() in k.replace('_', ' ').lower()]
-    else: filtered_items = all_items
-    for item_key in filtered_items:
-        food_info = db_instance.food_database[item_key]
-        item_name = item_key.replace('_', ' ').title()
-        gula = food_info['gula_per_100']
-        col1, col2 = st.columns([3,1])
-        with col1: st.markdown(f"**{item_name}**")
-        with col2: st.metric(label="Gula / 100g", value=f"{gula} g")
-        st.divider()
+    with get_metrics().span('catalog.search'):
+        matches = get_food_search_index().search(search_term)
+    if not matches: st.warning("Makanan tidak ditemukan.")
+    else:
+        col1, col2 = st.columns([3, 1])
+        page_size = col2.selectbox("Baris per halaman", CATALOG_PAGE_SIZES, index=1)
+        page_count = (len(matches) - 1) // page_size + 1
+        page = col1.number_input(f"Halaman (dari {page_count})", min_value=1, max_value=page_count, value=1, step=1)
+        page_rows = matches[(page - 1) * page_size:page * page_size]
+        get_metrics().incr('items_rendered.catalog_rows', len(page_rows))
+        st.dataframe(get_food_catalog_table().iloc[page_rows], use_container_width=True, hide_index=True)
+        st.caption(f"Menampilkan {len(page_rows)} dari {len(matches)} makanan.")
+
+PAGES = {
+    "Profil Pengguna": render_profile_page,
+    "Laporan Harian": render_daily_report_page,
+    "Tambah Asupan": render_add_intake_page,
+    "Riwayat & Grafik": render_history_page,
+    "Database Makanan": render_food_database_page,
+}
+
+def main():
+    """Satu eksekusi skrip Streamlit (dipanggil ulang pada setiap rerun)."""
+    # Inisialisasi Aplikasi
+    if 'tracker' not in st.session_state:
+        st.session_state.tracker = SugarTracker(user_id=session_history_user_id())
+
+    st.set_page_config(page_title="GluPal", page_icon="🍬", layout="wide")
+
+    st.html(APP_CSS)
+    metrics = get_metrics()
+    metrics.incr('reruns')
+    profiler = cProfile.Profile() if metrics.enabled and st.session_state.pop('profile_next_rerun', False) else None
+    if profiler: profiler.enable()
+
+    with st.sidebar:
+        st.image(static_asset("logo.svg"), width=100)
+        st.title("GluPal")
+        if 'tracker' in st.session_state and st.session_state.tracker.user_profile:
+            user_name = st.session_state.tracker.user_profile.get('nama', "Pengguna")
+        else:
+            user_name = "Pengguna"
+        st.write(f"Halo, **{user_name}**!")
+        menu_options = {"👤 Profil Pengguna": "Profil Pengguna","➕ Tambah Asupan": "Tambah Asupan","🏠 Laporan Harian": "Laporan Harian","📊 Riwayat & Grafik": "Riwayat & Grafik","📚 Database Makanan": "Database Makanan"}
+        selection = st.radio("Menu Navigasi:", options=menu_options.keys(), label_visibility="collapsed")
+        menu = menu_options[selection]
+        st.markdown("---")
+        st.info("Pantau gula, jaga kesehatan. Aplikasi ini siap membantumu setiap hari!")
+
+    try:
+        with metrics.span(f"page.{menu}"):
+            PAGES[menu]()
+    finally:
+        if profiler:
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(25)
+            st.session_state['last_profile'] = out.getvalue()
+    if metrics.enabled:
+        if METRICS_FILE: metrics.export(METRICS_FILE)
+        with st.sidebar: render_debug_panel(metrics)
+
+# Streamlit (termasuk AppTest) menjalankan skrip ini sebagai __main__; saat diimpor
+# sebagai modul (mis. oleh benchmark) hanya kelas dan fungsi yang didefinisikan.
+if __name__ == "__main__":
+    main()